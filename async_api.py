@@ -0,0 +1,131 @@
+import sys
+import csv
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import project
+import results
+
+# Asyncio API for services that embed the commands. Each call runs the blocking command on a
+# worker thread that borrows a connection from project.py's shared pool, and returns its result
+# instead of printing it, so a page can gather its lookups and wait only for the slowest one.
+# Read commands return a list of typed rows (see results.py) and write commands results.SUCCESS;
+# either returns a results.Failure instead when the command fails.
+# Workers and pooled connections are the same number, so at most pool_size queries run at once
+# and further calls wait in the executor's queue rather than on the pool.
+# Results go through the same result caches as serve and batch once project.configure_cache() is called.
+#
+#   api = CommandAPI(pool_size=8)
+#   releases, popular, episodes = await asyncio.gather(
+#       api.listReleases(uid), api.popularRelease(10), api.videosViewed(rid))
+#
+# Expect: python3 async_api.py <command,args...> [<command,args...> ...]   (runs them concurrently)
+#   e.g.  python3 async_api.py listReleases,3 popularRelease,5 "activeViewer,1,2025-01-01,2025-03-01"
+
+DEFAULT_POOL_SIZE = 8
+
+
+def read_rows(command, args):
+    """
+    Runs one read command and returns all of its rows, or a Failure.
+    """
+    result = project.read_result(command, args, raw=False)
+    if isinstance(result, results.Failure):
+        return result
+    try:
+        return result.all()
+    except Exception as e:
+        return results.Failure(str(e))
+
+
+def write(argv):
+    """
+    Runs one write command given as CLI arguments, then drops the cached results it made stale.
+    """
+    result = project.command_result(argv)
+    if result is None:
+        return results.Failure(f"{argv[0]} is not a command")
+    project.invalidate_cache(argv[0])
+    return result
+
+
+class CommandAPI:
+    """
+    Runs the commands concurrently on a bounded pool of threads and connections.
+    The connection pool is sized on first use, so create the API before anything else uses it;
+    raises ValueError if the pool is already open with a different size.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        project.configure_pool(pool_size)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="cs122a-api")
+
+    async def run(self, function, *args):
+        """
+        Runs a blocking function on a worker thread and returns its result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def listReleases(self, uid):
+        return await self.run(read_rows, "listReleases", (uid,))
+
+    async def popularRelease(self, num):
+        return await self.run(read_rows, "popularRelease", (num,))
+
+    async def releaseTitle(self, sid):
+        return await self.run(read_rows, "releaseTitle", (sid,))
+
+    async def activeViewer(self, N, start, end):
+        return await self.run(read_rows, "activeViewer", (N, start, end))
+
+    async def videosViewed(self, rid):
+        return await self.run(read_rows, "videosViewed", (rid,))
+
+    async def command(self, argv):
+        """
+        Runs any data command given as CLI arguments, e.g. ["popularRelease", "5"] or
+        ["addGenre", "3", "Comedy"].
+        """
+        if argv[0] in project.READ_QUERIES:
+            return await self.run(read_rows, argv[0], tuple(argv[1:]))
+        return await self.run(write, list(argv))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+async def run_concurrently(commands, pool_size=DEFAULT_POOL_SIZE):
+    """
+    Runs every command at once. Returns a list with each command's result, or the exception it raised.
+    """
+    async with CommandAPI(pool_size) as api:
+        return await asyncio.gather(*(api.command(argv) for argv in commands), return_exceptions=True)
+
+
+if __name__ == '__main__':
+    commands = [next(csv.reader([arg])) for arg in sys.argv[1:]]
+    if not commands:
+        print("Fail")
+        sys.exit(1)
+    start = time.perf_counter()
+    outcomes = asyncio.run(run_concurrently(commands, min(len(commands), DEFAULT_POOL_SIZE)))
+    status = 0
+    for argv, result in zip(commands, outcomes):
+        print("#", ",".join(argv))
+        if isinstance(result, Exception):
+            print("Fail", result)
+            status = 1
+        elif isinstance(result, list):
+            sys.stdout.write("".join(",".join(map(str, row)) + "\n" for row in result))
+        else:
+            project.print_result(result)
+            status |= not result.ok
+    sys.stderr.write(f"{len(commands)} commands in {time.perf_counter() - start:.3f}s\n")
+    sys.exit(status)
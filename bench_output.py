@@ -0,0 +1,66 @@
+import io
+import sys
+import time
+
+import project
+
+# Compares the default text output mode with CS122A_OUTPUT=raw for one read command, checking
+# that both print exactly the same bytes. Raw mode exists only on the MySQL backend.
+# Expect: python3 bench_output.py <command> [args...] [--runs=N]
+#   e.g.  python3 bench_output.py activeViewer 1 2024-01-01 2025-12-31 --runs=5
+
+DEFAULT_RUNS = 5
+MODES = {"text": False, "raw": True}
+
+
+def run_captured(argv):
+    """
+    Runs one command with stdout captured as bytes. Returns (seconds, output bytes).
+    """
+    captured = io.TextIOWrapper(io.BytesIO(), encoding="utf-8", newline="")
+    stdout = sys.stdout
+    sys.stdout = captured
+    start = time.perf_counter()
+    try:
+        project.run_command(argv)
+        captured.flush()
+    finally:
+        elapsed = time.perf_counter() - start
+        sys.stdout = stdout
+    return elapsed, captured.buffer.getvalue()
+
+
+def bench(argv, runs=DEFAULT_RUNS):
+    """
+    Runs argv runs times in each output mode, after one warm-up run.
+    Returns {mode: (best seconds, mean seconds, output bytes)}.
+    """
+    results = {}
+    for mode, raw in MODES.items():
+        project.RAW_OUTPUT = raw
+        run_captured(argv)
+        timings = []
+        for _ in range(runs):
+            elapsed, output = run_captured(argv)
+            timings.append(elapsed)
+        results[mode] = (min(timings), sum(timings) / len(timings), output)
+    return results
+
+
+if __name__ == '__main__':
+    args, options = project.parse_options(sys.argv[1:])
+    if not args:
+        print("Fail")
+        sys.exit(1)
+    if project.BACKEND != "mysql":
+        print("Fail")
+        sys.stderr.write(f"raw output needs the mysql backend, not {project.BACKEND}\n")
+        sys.exit(1)
+    results = bench(args, int(options.get("runs", DEFAULT_RUNS)))
+    text_output = results["text"][2]
+    print(f"{'mode':<6} {'best s':>10} {'mean s':>10} {'lines':>10} {'bytes':>12}  same as text")
+    for mode, (best, mean, output) in results.items():
+        lines = output.count(b"\n")
+        print(f"{mode:<6} {best:>10.4f} {mean:>10.4f} {lines:>10} {len(output):>12}  "
+              f"{'yes' if output == text_output else 'NO'}")
+    sys.exit(0 if all(output == text_output for _, _, output in results.values()) else 1)
@@ -0,0 +1,275 @@
+import json
+import time
+import sqlite3
+import threading
+from decimal import Decimal
+from datetime import date, datetime, time as clock_time, timedelta
+from collections import OrderedDict
+
+# In-process result cache for the read commands in serve and batch modes.
+# Entries are keyed by (command, args) and remember which tables they were read from, so a write
+# drops only the entries for the tables it touched. Writes made by other processes are only
+# picked up when an entry expires, so keep the TTL short. DiskCache keeps results across
+# processes and checks them against the table_versions counters in MySQL instead.
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 30.0  # seconds
+MAX_CACHED_ROWS = 10000  # Larger results are streamed without being kept
+
+# DiskCache stores rows as JSON, never pickle, so a cache file written by someone else can at
+# worst return wrong rows, not run code. Column types JSON lacks are tagged {"$type": text}.
+ENCODED_TYPES = [
+    ("datetime", datetime, datetime.isoformat, datetime.fromisoformat),
+    ("date", date, date.isoformat, date.fromisoformat),
+    ("time", clock_time, clock_time.isoformat, clock_time.fromisoformat),
+    ("timedelta", timedelta, lambda value: repr(value.total_seconds()), lambda text: timedelta(seconds=float(text))),
+    ("decimal", Decimal, str, Decimal),
+    ("bytes", (bytes, bytearray), lambda value: value.hex(), bytes.fromhex),
+]
+DECODERS = {"$" + tag: decode for tag, _, _, decode in ENCODED_TYPES}
+
+
+def encode_value(value):
+    for tag, kind, encode, _ in ENCODED_TYPES:
+        if isinstance(value, kind):
+            return {"$" + tag: encode(value)}
+    raise TypeError(f"cannot cache a {type(value).__name__} value")
+
+
+def decode_value(obj):
+    ((tag, text),) = obj.items()
+    return DECODERS[tag](text)
+
+
+def encode_rows(rows):
+    """
+    Serializes rows for DiskCache. Raises TypeError for a value of a type it cannot store.
+    """
+    return json.dumps(rows, default=encode_value, separators=(",", ":"))
+
+
+def decode_rows(text):
+    """
+    Reads rows written by encode_rows() back as tuples of the original values.
+    """
+    return [tuple(row) for row in json.loads(text, object_hook=decode_value)]
+
+
+def result_size(rows):
+    """
+    Roughly estimates the memory a cached result holds, in bytes.
+    """
+    return 64 + sum(len(repr(row)) for row in rows)
+
+
+class ResultCache:
+    """
+    LRU cache with a TTL, bounded by entry count and estimated bytes. Thread-safe.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (rows, tables, size, expires_at), oldest first
+        self.by_table = {}            # table -> set of keys read from it
+        self.versions = {}            # table -> invalidation count, see snapshot()
+        self.epoch = 0                # bumped by clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Returns the cached rows for key, or None on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[3] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def snapshot(self, tables):
+        """
+        Returns the invalidation counts of tables, taken before running the query whose result
+        is passed to put(), so a write that lands in between keeps the stale result out.
+        """
+        with self.lock:
+            return self._versions(tables)
+
+    def put(self, key, rows, tables, snapshot):
+        """
+        Caches rows read from tables, evicting least recently used entries to stay in bounds.
+        """
+        size = result_size(rows)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if snapshot != self._versions(tables):
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (rows, tables, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            for table in tables:
+                self.by_table.setdefault(table, set()).add(key)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        """
+        Drops every entry read from any of tables.
+        """
+        with self.lock:
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+                for key in list(self.by_table.pop(table, ())):
+                    if key in self.entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        """
+        Drops every entry, e.g. after an import replaced the tables.
+        """
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.epoch += 1
+            self.entries.clear()
+            self.by_table.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        Returns the counters and current size as a dict.
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
+
+    def _versions(self, tables):
+        return (self.epoch,) + tuple(self.versions.get(table, 0) for table in tables)
+
+    def _remove(self, key):
+        rows, tables, size, _ = self.entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self.by_table.get(table)
+            if keys:
+                keys.discard(key)
+
+
+class DiskCache:
+    """
+    Result cache in a local SQLite file, shared by every project.py process that points at it.
+    Entries are tagged with the table_versions counters they were read under; an entry is only
+    returned while those counters are unchanged. The last counters read from MySQL are kept
+    too, and reused without a round trip for max_staleness seconds.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_staleness=0.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results ("
+                        "key TEXT PRIMARY KEY, versions TEXT NOT NULL, rows BLOB NOT NULL, used_at REAL NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS versions ("
+                        "table_name TEXT PRIMARY KEY, version TEXT NOT NULL, checked_at REAL NOT NULL)")
+
+    def fresh_versions(self, tables):
+        """
+        Returns the versions of tables last read from MySQL, if all were read within
+        max_staleness seconds; None means they must be read again.
+        """
+        if self.max_staleness <= 0:
+            return None
+        with self.lock:
+            found = dict(self.db.execute(
+                f"SELECT table_name, version FROM versions WHERE checked_at >= ? "
+                f"AND table_name IN ({', '.join('?' * len(tables))})",
+                (time.time() - self.max_staleness,) + tuple(tables),
+            ).fetchall())
+        if len(found) < len(tables):
+            return None
+        return tuple(found[table] for table in tables)
+
+    def save_versions(self, versions):
+        """
+        Remembers {table: version} as just read from MySQL. Versions are kept as strings, since
+        UUID_SHORT() values can exceed SQLite's signed 64-bit integers.
+        """
+        now = time.time()
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO versions (table_name, version, checked_at) VALUES (?, ?, ?)",
+                                [(table, version, now) for table, version in versions.items()])
+
+    def forget_versions(self):
+        """
+        Makes the next read go back to MySQL for versions, e.g. after this process wrote.
+        """
+        with self.lock:
+            self.db.execute("DELETE FROM versions")
+
+    def get(self, key, versions):
+        """
+        Returns the rows cached for key under exactly these versions, or None.
+        """
+        with self.lock:
+            row = self.db.execute("SELECT versions, rows FROM results WHERE key = ?", (repr(key),)).fetchone()
+            if row is None or row[0] != repr(versions):
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE results SET used_at = ? WHERE key = ?", (time.time(), repr(key)))
+            self.hits += 1
+        try:
+            return decode_rows(row[1])
+        except (ValueError, KeyError, TypeError):
+            return None  # Not written by encode_rows(), e.g. by an older version
+
+    def put(self, key, versions, rows):
+        """
+        Stores rows read under versions, then trims the least recently used entries.
+        Rows holding a value encode_rows() cannot store are not cached.
+        """
+        try:
+            data = encode_rows(rows)
+        except TypeError:
+            return
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO results (key, versions, rows, used_at) VALUES (?, ?, ?, ?)",
+                            (repr(key), repr(versions), data, time.time()))
+            self.db.execute("DELETE FROM results WHERE key NOT IN "
+                            "(SELECT key FROM results ORDER BY used_at DESC LIMIT ?)", (self.max_entries,))
+
+    def stats(self):
+        """
+        Returns hit/miss counters for this process and the number of stored entries.
+        """
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
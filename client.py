@@ -0,0 +1,20 @@
+import sys
+
+import server
+
+# Thin client for `python project.py serve`.
+# Expect: python3 client.py <command> [args...]  (same arguments and output as project.py)
+# Set CS122A_SOCKET or CS122A_PORT to match the server.
+
+if __name__ == '__main__':
+    try:
+        sock = server.connect()
+    except OSError as e:
+        sys.stdout.write("Fail")
+        sys.stderr.write(f"Cannot reach server: {e}\n")
+        sys.exit(1)
+
+    with sock, sock.makefile("rwb") as sock_file:
+        status, output = server.send_command(sock_file, sys.argv[1:])
+    sys.stdout.write(output)
+    sys.exit(status)
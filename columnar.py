@@ -0,0 +1,432 @@
+import os
+import re
+import csv
+import sys
+import array
+import bisect
+import unicodedata
+from collections import Counter
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+
+import loader
+
+# NumPy is optional: with it the group-bys, sorts and range scans below run vectorized over the
+# column buffers; without it the same steps run over the arrays in plain Python.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# In-memory columnar engine for the read commands over a folder of import CSVs, for reporting
+# jobs that do not need a database at all. Integer, DATE and DATETIME columns are int64 arrays
+# (days / seconds since 1970-01-01, the layout of NumPy's datetime64[D] and [s]), ENUM columns are
+# int16 codes into the labels declared in schema.sql and text columns are one UTF-8 heap each.
+# Output is the same as `project.py <command>` against the same data imported into MySQL.
+# Expect: python3 columnar.py <folder | snapshot dir> <command> [args...]
+#   e.g.  python3 columnar.py test_data activeViewer 1 2025-01-01 2025-03-01
+#         python3 columnar.py test_data < commands.txt   (one CSV-quoted command per line, as batch)
+
+ENGINE_TABLES = ("releases", "reviews", "sessions", "videos", "viewers")
+
+INT_NULL = -(2 ** 63)  # Also NumPy's NaT, so NULL dates stay NaT in datetime64 views
+ENUM_NULL = -1
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+ONE_DAY = timedelta(days=1)
+
+
+@lru_cache(maxsize=None)
+def schema_columns(schema_path=loader.SCHEMA_PATH):
+    """
+    Returns {table: ((column, kind, enum labels), ...)} for the tables in schema.sql, where kind is
+    "int", "date", "datetime", "enum" or "str" (everything else, DECIMAL included, is kept as text).
+    """
+    tables = {}
+    for statement in loader.read_schema_statements(schema_path):
+        table_def = loader.parse_create_table(statement)
+        if not table_def:
+            continue
+        table, items, _ = table_def
+        columns = []
+        for item in items:
+            if re.match(r"(CONSTRAINT\s+\w+\s+)?(PRIMARY|FOREIGN|UNIQUE|KEY|INDEX)\b", item, re.IGNORECASE):
+                continue
+            name, column_type = item.split()[:2]
+            enum = re.match(r"ENUM\s*\((.*?)\)", item[len(name):].strip(), re.IGNORECASE)
+            if enum:
+                columns.append((name, "enum", tuple(re.findall(r"'((?:[^']|'')*)'", enum.group(1)))))
+            elif re.match(r"(TINYINT|SMALLINT|INT|INTEGER|BIGINT)\b", column_type, re.IGNORECASE):
+                columns.append((name, "int", ()))
+            elif re.match(r"DATETIME\b", column_type, re.IGNORECASE):
+                columns.append((name, "datetime", ()))
+            elif re.match(r"DATE\b", column_type, re.IGNORECASE):
+                columns.append((name, "date", ()))
+            else:
+                columns.append((name, "str", ()))
+        tables[table] = tuple(columns)
+    return tables
+
+
+class StringColumn:
+    """
+    Text values stored as one UTF-8 heap plus offsets: value i is heap[offsets[i]:offsets[i + 1]].
+    Values are decoded on access, so a heap that is a memory-mapped file is never copied whole.
+    """
+
+    def __init__(self, offsets, heap):
+        self.offsets = offsets
+        self.heap = heap
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.heap[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+def parse_datetime(text):
+    """
+    Converts "YYYY-MM-DD[ HH:MM:SS]" to whole seconds since the epoch, as DATETIME stores it.
+    """
+    return (datetime.fromisoformat(text) - EPOCH) // ONE_SECOND
+
+
+class ColumnBuilder:
+    """
+    Encodes one column's CSV texts as they are read. Empty fields become NULL in every kind but text.
+    """
+
+    def __init__(self, kind, labels):
+        self.kind = kind
+        self.labels = labels
+        self.codes = {label: code for code, label in enumerate(labels)}
+        self.values = array.array("h" if kind == "enum" else "q")
+        self.heap = bytearray()
+        if kind == "str":
+            self.values.append(0)  # The offsets of a StringColumn start at 0
+
+    def append(self, text):
+        """
+        Adds one value. Raises ValueError if text is not a value of the column's kind.
+        """
+        kind = self.kind
+        if kind == "str":
+            self.heap += text.encode("utf-8")
+            self.values.append(len(self.heap))
+        elif not text:
+            self.values.append(ENUM_NULL if kind == "enum" else INT_NULL)
+        elif kind == "int":
+            self.values.append(int(text))
+        elif kind == "datetime":
+            self.values.append(parse_datetime(text))
+        elif kind == "date":
+            self.values.append((date.fromisoformat(text) - EPOCH.date()).days)
+        elif text in self.codes:
+            self.values.append(self.codes[text])
+        else:
+            raise ValueError(f"{text!r} is not one of {', '.join(self.labels)}")
+
+    def column(self):
+        """
+        Returns the finished column: an int64 / int16 array, or a StringColumn.
+        """
+        if self.kind == "str":
+            return StringColumn(self.values, bytes(self.heap))
+        return self.values
+
+
+class Table:
+    """
+    The columns of one table, all of the same length, with the schema kind of each.
+    """
+
+    def __init__(self, name, columns, kinds):
+        self.name = name
+        self.columns = columns  # column -> int64 array, int16 enum codes or StringColumn
+        self.kinds = kinds      # column -> (kind, enum labels)
+        self.rows = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def value(self, column, i):
+        """
+        Returns one value as the MySQL connector would: int, date, datetime, str or None.
+        """
+        kind, labels = self.kinds[column]
+        raw = self.columns[column][i]
+        if kind == "str":
+            return raw
+        if kind == "enum":
+            return None if raw == ENUM_NULL else labels[raw]
+        if raw == INT_NULL:
+            return None
+        if kind == "datetime":
+            return EPOCH + raw * ONE_SECOND
+        if kind == "date":
+            return EPOCH.date() + raw * ONE_DAY
+        return int(raw)
+
+
+def load_table(file_path, table, schema_path=loader.SCHEMA_PATH):
+    """
+    Loads one import CSV into a Table, encoding each row into the column arrays as it is read.
+    Columns the CSV lacks are all NULL (empty for text); CSV columns the table does not have are
+    skipped, like the importers do. Blank lines are skipped.
+    Raises ValueError for a row with the wrong number of fields or a value of the wrong kind.
+    """
+    kinds = {name: (kind, labels) for name, kind, labels in schema_columns(schema_path)[table]}
+    builders = {name: ColumnBuilder(kind, labels) for name, (kind, labels) in kinds.items()}
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = {column: i for i, column in enumerate(header)}
+        fields = [(builders[name].append, positions.get(name)) for name in kinds]
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(header):
+                raise ValueError(f"{file_path} line {reader.line_num}: "
+                                 f"{len(row)} fields where the header has {len(header)}")
+            try:
+                for append, position in fields:
+                    append("" if position is None else row[position])
+            except (ValueError, OverflowError) as e:
+                raise ValueError(f"{file_path} line {reader.line_num}: {e}") from None
+    return Table(table, {name: builder.column() for name, builder in builders.items()}, kinds)
+
+
+def load_folder(folder, tables=ENGINE_TABLES, schema_path=loader.SCHEMA_PATH):
+    """
+    Loads <folder>/<table>.csv for each table. Returns {table: Table}; a missing CSV is an empty table.
+    """
+    loaded = {}
+    for table in tables:
+        file_path = os.path.join(folder, f"{table}.csv")
+        if os.path.exists(file_path):
+            loaded[table] = load_table(file_path, table, schema_path)
+        else:
+            loaded[table] = empty_table(table, schema_path)
+    return loaded
+
+
+def empty_table(table, schema_path=loader.SCHEMA_PATH):
+    """
+    Returns a Table with the table's columns and no rows.
+    """
+    kinds = {name: (kind, labels) for name, kind, labels in schema_columns(schema_path)[table]}
+    return Table(table, {name: ColumnBuilder(kind, labels).column() for name, (kind, labels) in kinds.items()}, kinds)
+
+
+def int64_view(column):
+    """
+    Returns an int64 NumPy array sharing the column's buffer (array.array or memoryview).
+    """
+    return np.frombuffer(column, dtype=np.int64)
+
+
+def group_counts(keys):
+    """
+    Returns {key: number of rows} for an int64 column.
+    """
+    if np is not None and len(keys):
+        values, counts = np.unique(int64_view(keys), return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+    return Counter(keys)
+
+
+def distinct_counts(keys, others):
+    """
+    Returns {key: number of distinct others} for two int64 columns, like COUNT(DISTINCT other) GROUP BY key.
+    """
+    if np is not None and len(keys):
+        pairs = np.unique(np.stack([int64_view(keys), int64_view(others)], axis=1), axis=0)
+        values, counts = np.unique(pairs[:, 0], return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+    return Counter(key for key, _ in set(zip(keys, others)))
+
+
+def sorted_by(values, others):
+    """
+    Sorts two int64 columns by the first. Returns (sorted values, others in that order).
+    """
+    if np is not None and len(values):
+        order = np.argsort(int64_view(values), kind="stable")
+        return int64_view(values)[order], int64_view(others)[order]
+    order = sorted(range(len(values)), key=values.__getitem__)
+    return array.array("q", [values[i] for i in order]), array.array("q", [others[i] for i in order])
+
+
+def collation_key(text):
+    """
+    Sort key for text as MySQL's default utf8mb4_0900_ai_ci collation compares it:
+    case- and accent-insensitive.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def as_int(value):
+    """
+    Converts a command argument compared with an integer column. Returns None if it is not an
+    integer, which matches no rows.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ColumnarEngine:
+    """
+    Answers the read commands from loaded Tables. Lookup indexes and per-release counts are
+    built on first use and reused by later commands.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.indexes = {}
+
+    def index(self, name, build):
+        if name not in self.indexes:
+            self.indexes[name] = build()
+        return self.indexes[name]
+
+    def row_index(self, table, column):
+        """
+        Returns {value: row} for a primary key column.
+        """
+        values = self.tables[table][column]
+        return self.index((table, column), lambda: {value: i for i, value in enumerate(values)})
+
+    def group_index(self, table, column):
+        """
+        Returns {value: [rows in table order]} for a non-unique column.
+        """
+        def build():
+            groups = {}
+            for i, value in enumerate(self.tables[table][column]):
+                groups.setdefault(value, []).append(i)
+            return groups
+        return self.index((table, column, "groups"), build)
+
+    def listReleases(self, uid):
+        # DISTINCT releases the viewer reviewed, ORDER BY title
+        reviews, releases = self.tables["reviews"], self.tables["releases"]
+        release_rows = self.row_index("releases", "rid")
+        rids = {reviews["rid"][i] for i in self.group_index("reviews", "uid").get(as_int(uid), ())}
+        rows = [(rid, releases.value("genre", release_rows[rid]), releases.value("title", release_rows[rid]))
+                for rid in rids if rid in release_rows]
+        return sorted(rows, key=lambda row: (collation_key(row[2]), row[0]))
+
+    def popularRelease(self, num):
+        # Review count per release, zero included, ORDER BY count DESC, rid DESC LIMIT num
+        num = int(num)
+        releases = self.tables["releases"]
+
+        def build():
+            counts = group_counts(self.tables["reviews"]["rid"])
+            return sorted(((counts.get(rid, 0), rid, i) for i, rid in enumerate(releases["rid"])), reverse=True)
+        ranked = self.index("release_review_counts", build)
+        return [(rid, releases.value("title", i), count) for count, rid, i in ranked[:max(num, 0)]]
+
+    def releaseTitle(self, sid):
+        # The release and video of one session
+        sessions, videos, releases = self.tables["sessions"], self.tables["videos"], self.tables["releases"]
+        session = self.row_index("sessions", "sid").get(as_int(sid))
+        if session is None:
+            return []
+        video_rows = self.index("video_keys", lambda: {key: i for i, key in enumerate(zip(videos["rid"],
+                                                                                         videos["ep_num"]))})
+        video = video_rows.get((sessions["rid"][session], sessions["ep_num"][session]))
+        release = self.row_index("releases", "rid").get(sessions["rid"][session])
+        if video is None or release is None:
+            return []
+        return [(releases.value("rid", release), releases.value("title", release), releases.value("genre", release),
+                 videos.value("title", video), videos.value("ep_num", video), videos.value("length", video))]
+
+    def activeViewer(self, N, start, end):
+        # Viewers with at least N sessions initiated BETWEEN start AND end, ORDER BY uid
+        N = int(N)
+        low, high = parse_datetime(start), parse_datetime(end)
+        sessions, viewers = self.tables["sessions"], self.tables["viewers"]
+        times, uids = self.index("sessions_by_time", lambda: sorted_by(sessions["initiate_at"], sessions["uid"]))
+        if np is not None and isinstance(times, np.ndarray):
+            first, last = np.searchsorted(times, low, "left"), np.searchsorted(times, high, "right")
+            values, counts = np.unique(uids[first:last], return_counts=True)
+            active = values[counts >= N].tolist()
+        else:
+            first, last = bisect.bisect_left(times, low), bisect.bisect_right(times, high)
+            active = sorted(uid for uid, count in Counter(uids[first:last]).items() if count >= N)
+        viewer_rows = self.row_index("viewers", "uid")
+        return [(uid, viewers.value("first_name", viewer_rows[uid]), viewers.value("last_name", viewer_rows[uid]))
+                for uid in active if uid in viewer_rows]
+
+    def videosViewed(self, rid):
+        # Each episode of a release with the release's distinct viewer count, ORDER BY ep_num
+        sessions, videos = self.tables["sessions"], self.tables["videos"]
+        viewer_counts = self.index("release_viewer_counts",
+                                   lambda: distinct_counts(sessions["rid"], sessions["uid"]))
+        rid = as_int(rid)
+        episodes = sorted(self.group_index("videos", "rid").get(rid, ()), key=videos["ep_num"].__getitem__)
+        return [(rid, videos.value("ep_num", i), videos.value("title", i), videos.value("length", i),
+                 viewer_counts.get(rid, 0)) for i in episodes]
+
+    def run(self, argv):
+        """
+        Runs one read command, given the same arguments as project.py. Returns its rows.
+        """
+        command = argv[0]
+        if command == "listReleases":
+            return self.listReleases(argv[1])
+        if command == "popularRelease":
+            return self.popularRelease(argv[1])
+        if command == "releaseTitle":
+            return self.releaseTitle(argv[1])
+        if command == "activeViewer":
+            return self.activeViewer(argv[1], argv[2], argv[3])
+        if command == "videosViewed":
+            return self.videosViewed(argv[1])
+        raise ValueError(f"{command} is not a read command")
+
+
+def run_commands(engine, commands):
+    """
+    Runs each command and prints its rows as project.py does. Returns 0 if every command ran; 1 otherwise.
+    """
+    status = 0
+    for argv in commands:
+        if not argv or argv[0].startswith("#"):
+            continue
+        try:
+            rows = engine.run(argv)
+        except Exception as e:
+            print("Fail", e)
+            status = 1
+            continue
+        sys.stdout.write("".join(",".join(map(str, row)) + "\n" for row in rows))
+    return status
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Fail")
+        sys.exit(1)
+    import snapshot  # Imports this module in turn, so only needed when run as a script
+    try:
+        if snapshot.is_snapshot(sys.argv[1]):
+            tables = snapshot.load_snapshot(sys.argv[1], ENGINE_TABLES)
+            tables = {table: tables.get(table) or empty_table(table) for table in ENGINE_TABLES}
+        else:
+            tables = load_folder(sys.argv[1])
+        engine = ColumnarEngine(tables)
+    except (OSError, ValueError, csv.Error) as e:
+        print("Fail", e)
+        sys.exit(1)
+    if len(sys.argv) > 2:
+        sys.exit(run_commands(engine, [sys.argv[2:]]))
+    sys.exit(run_commands(engine, csv.reader(sys.stdin)))
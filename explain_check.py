@@ -0,0 +1,112 @@
+import sys
+
+import project
+
+# Runs EXPLAIN on every command's SQL against the loaded database and fails when a plan
+# scans a whole table/index or sorts more rows than --max-rows.
+# Expect: python3 explain_check.py [--max-rows=N] [--verbose]  (after `python3 project.py import <folder>`)
+
+DEFAULT_MAX_ROWS = 1000
+
+# Sample arguments are taken from the data so the optimizer sees realistic values
+SAMPLE_SQL = {
+    "uid": "SELECT uid FROM reviews ORDER BY rvid LIMIT 1",
+    "sid": "SELECT MIN(sid) FROM sessions",
+    "rid": "SELECT rid FROM videos ORDER BY rid LIMIT 1",
+    "end": "SELECT MAX(initiate_at) FROM sessions",
+}
+
+
+def sample_values(cursor):
+    """
+    Picks one existing uid, sid and rid, and a 30 day window ending at the latest session.
+    """
+    values = {}
+    for name, sql_code in SAMPLE_SQL.items():
+        cursor.execute(sql_code)
+        row = cursor.fetchone()
+        values[name] = row[0] if row else None
+    if values["end"] is None:
+        values["start"] = values["end"] = "2024-01-01 00:00:00"
+    else:
+        cursor.execute("SELECT %s - INTERVAL 30 DAY", (values["end"],))
+        values["start"] = str(cursor.fetchone()[0])
+        values["end"] = str(values["end"])
+    return values
+
+
+def command_queries(values):
+    """
+    Returns (command, sql, params) for every statement the commands run with a WHERE clause.
+    """
+    uid, sid, rid = values["uid"], values["sid"], values["rid"]
+    return [
+        ("listReleases",) + project.list_releases_query(uid),
+        ("popularRelease",) + project.popular_release_query(10),
+        ("releaseTitle",) + project.release_title_query(sid),
+        ("activeViewer",) + project.active_viewer_query(1, values["start"], values["end"]),
+        ("videosViewed",) + project.videos_viewed_query(rid),
+        ("insertViewer", project.USER_EXISTS_SQL, (uid,)),
+        ("addGenre", project.USER_HAS_GENRE_SQL, (uid, "Comedy")),
+        ("deleteViewer", project.DELETE_VIEWER_SQL, (uid,)),
+        ("updateRelease", project.UPDATE_RELEASE_SQL, ("title", rid)),
+    ]
+
+
+def plan_problems(plan, max_rows):
+    """
+    Checks EXPLAIN rows (as dicts) for full scans and large sorts. Returns a list of messages.
+    """
+    problems = []
+    for step in plan:
+        rows = int(step.get("rows") or 0)
+        extra = step.get("Extra") or ""
+        table = step.get("table")
+        if rows <= max_rows:
+            continue
+        if step.get("type") == "ALL":
+            problems.append(f"full table scan on {table} (~{rows} rows)")
+        elif step.get("type") == "index":
+            problems.append(f"full index scan on {table} (~{rows} rows)")
+        if "Using filesort" in extra or "Using temporary" in extra:
+            problems.append(f"sort/temporary table over {table} (~{rows} rows)")
+    return problems
+
+
+def check(max_rows=DEFAULT_MAX_ROWS, verbose=False):
+    """
+    EXPLAINs every command query and prints OK/FAIL per command. Returns the number of failures.
+    """
+    conn = project.open_connection()
+    if not conn:
+        raise RuntimeError("cannot connect to MySQL")
+    failures = 0
+    try:
+        cursor = conn.cursor(dictionary=True)
+        plain = conn.cursor()
+        values = sample_values(plain)
+        for command, sql_code, params in command_queries(values):
+            cursor.execute("EXPLAIN " + sql_code, params)
+            plan = cursor.fetchall()
+            if verbose:
+                for step in plan:
+                    print("   ", step.get("table"), step.get("type"), step.get("key"), step.get("rows"), step.get("Extra"))
+            problems = plan_problems(plan, max_rows)
+            if problems:
+                failures += 1
+                print("FAIL", command + ":", "; ".join(problems))
+            else:
+                print("OK", command)
+    finally:
+        conn.close()
+    return failures
+
+
+if __name__ == '__main__':
+    _, options = project.parse_options(sys.argv[1:])
+    try:
+        failed = check(int(options.get("max_rows", DEFAULT_MAX_ROWS)), bool(options.get("verbose")))
+    except Exception as e:
+        print("Fail", e)
+        sys.exit(1)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,794 @@
+import os
+import sys
+import csv
+import re
+import time
+import mmap
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# The connector is only needed to import into MySQL; the schema helpers work without it
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+# Import tables in the correct order (parents before children); the scheduler may overlap independent ones
+TABLES = ["users", "producers", "viewers", "releases", "movies", "series", "videos", "sessions", "reviews"]
+
+# Error codes MySQL uses when LOAD DATA LOCAL INFILE is disabled on either side
+LOCAL_INFILE_DISABLED = {1148, 2068, 3948}
+
+# LOAD DATA LOCAL turns row errors into warnings: it skips duplicate and orphaned rows (1062, 1216,
+# 1452) and loads short, long or unconvertible rows as zero/empty values (1261, 1262, 1265, 1292,
+# 1366). Any of these fails the load, as INSERT would; only Note-level messages are let through.
+FAILING_WARNING_LEVELS = {"Warning", "Error"}
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_COMMIT_EVERY = 10
+
+# Connections used to load independent tables at the same time
+DEFAULT_WORKERS = 4
+
+# CSV files bigger than one chunk are split and loaded by chunk_workers connections in parallel
+DEFAULT_CHUNK_WORKERS = 4
+DEFAULT_CHUNK_SIZE = 256 * 1024 * 1024
+DEFAULT_CHUNK_RETRIES = 2
+# Bytes copied at a time while counting quotes to place chunk boundaries
+QUOTE_SCAN_BLOCK = 1024 * 1024
+
+# Bytes hashed at the start and at the loaded end of a CSV to detect changes between imports
+FINGERPRINT_BLOCK = 64 * 1024
+
+# Session settings for load-then-index imports
+DEFERRED_SESSION_SQL = ["SET SESSION FOREIGN_KEY_CHECKS = 0;", "SET SESSION UNIQUE_CHECKS = 0;"]
+
+# Turns off the summary-table triggers in schema.sql; a full import rebuilds the rollups at the end
+SKIP_ROLLUPS_SQL = "SET @cs122a_skip_rollups = 1;"
+
+# Bytes kept free under max_allowed_packet for the INSERT prefix and protocol framing
+PACKET_HEADROOM = 16 * 1024
+
+
+def read_header(file_path):
+    """
+    Returns the CSV header columns and the line terminator used by the file.
+    """
+    with open(file_path, newline='', encoding='utf-8') as csvfile:
+        first_line = csvfile.readline()
+    terminator = "\r\n" if first_line.endswith("\r\n") else "\n"
+    columns = next(csv.reader([first_line.rstrip("\r\n")]), [])
+    return columns, terminator
+
+
+def map_columns(cursor, table, header):
+    """
+    Maps CSV header names onto the table's columns (case-insensitive).
+    Headers that match no column are read into a throwaway @variable so LOAD DATA skips them.
+    """
+    cursor.execute(f"SHOW COLUMNS FROM {table};")
+    table_columns = {row[0].lower(): row[0] for row in cursor.fetchall()}
+
+    targets = []
+    for i, name in enumerate(header):
+        column = table_columns.get(name.strip().lower())
+        targets.append(column if column else f"@skip{i}")
+    return targets
+
+
+def report(table, rows, seconds, method):
+    """
+    Writes per-table load throughput to stderr so stdout stays "Success"/"Fail".
+    """
+    rate = rows / seconds if seconds > 0 else float(rows)
+    sys.stderr.write(f"{table}: {rows} rows in {seconds:.2f}s ({rate:,.0f} rows/sec) via {method}\n")
+
+
+def check_load_warnings(cursor):
+    """
+    Raises on the first warning LOAD DATA LOCAL left, so a skipped or mangled row fails the
+    import like INSERT would instead of being loaded or dropped silently.
+    """
+    if not cursor.warning_count:
+        return
+    cursor.execute("SHOW WARNINGS;")
+    for level, code, message in cursor.fetchall():
+        if level in FAILING_WARNING_LEVELS:
+            raise mysql.connector.Error(msg=message, errno=code)
+
+
+def load_data_infile(cursor, table, file_path, targets, terminator):
+    """
+    Streams one CSV file into the table with LOAD DATA LOCAL INFILE.
+    Returns the number of rows loaded.
+    """
+    sql_code = (
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+        f"CHARACTER SET utf8mb4 "
+        f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+        f"LINES TERMINATED BY %s "
+        f"IGNORE 1 LINES "
+        f"({', '.join(targets)});"
+    )
+    cursor.execute(sql_code, (os.path.abspath(file_path), terminator))
+    rows = cursor.rowcount
+    check_load_warnings(cursor)
+    return rows
+
+
+def max_packet_bytes(cursor):
+    """
+    Returns the server's max_allowed_packet, which bounds the size of one INSERT statement.
+    """
+    cursor.execute("SELECT @@max_allowed_packet;")
+    return int(cursor.fetchone()[0])
+
+
+def select_fields(reader, keep, width):
+    """
+    Yields the fields at the positions in keep of each row from a csv.reader, skipping blank lines.
+    Raises ValueError for a row that does not have width fields (the header's count).
+    """
+    for row in reader:
+        if not row:
+            continue
+        if len(row) != width:
+            raise ValueError(f"line {reader.line_num}: {len(row)} fields where the header has {width}")
+        yield [row[i] for i in keep]
+
+
+def csv_rows(file_path, keep):
+    """
+    Lazily yields the data rows of a CSV file, keeping only the column positions in keep.
+    Raises ValueError for a row whose field count differs from the header's.
+    """
+    with open(file_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        yield from select_fields(reader, keep, len(header))
+
+
+def batch_rows(rows, batch_size, max_bytes):
+    """
+    Groups rows into lists of at most batch_size rows whose escaped size stays under max_bytes.
+    """
+    batch = []
+    size = 0
+    for row in rows:
+        # Worst case every byte is escaped, plus quotes and a separator per value
+        row_size = sum(2 * len(value.encode('utf-8')) + 3 for value in row)
+        if batch and (len(batch) >= batch_size or size + row_size > max_bytes):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        yield batch
+
+
+def insert_batches(conn, cursor, table, columns, rows, batch_size=DEFAULT_BATCH_SIZE,
+                   commit_every=DEFAULT_COMMIT_EVERY, max_bytes=None, upsert=False):
+    """
+    Sends rows as multi-row INSERT ... VALUES (...),(...) statements, committing every
+    commit_every batches so the transaction stays bounded on huge files (None: only at the end).
+    With upsert, rows whose key already exists overwrite it (ON DUPLICATE KEY UPDATE).
+    Returns the number of rows sent.
+    """
+    if max_bytes is None:
+        max_bytes = max_packet_bytes(cursor) - PACKET_HEADROOM
+    prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    suffix = ""
+    if upsert:
+        suffix = " ON DUPLICATE KEY UPDATE " + ", ".join(f"{column} = VALUES({column})" for column in columns)
+    full_query = prefix + ", ".join([row_placeholders] * batch_size) + suffix
+
+    inserted = 0
+    batches = 0
+    for batch in batch_rows(rows, batch_size, max_bytes):
+        if len(batch) == batch_size:
+            insert_query = full_query
+        else:
+            insert_query = prefix + ", ".join([row_placeholders] * len(batch)) + suffix
+        cursor.execute(insert_query, [value for row in batch for value in row])
+        inserted += len(batch)
+        batches += 1
+        if commit_every and batches % commit_every == 0:
+            conn.commit()
+    conn.commit()
+    return inserted
+
+
+def insert_csv_batched(conn, cursor, table, file_path, targets, batch_size=DEFAULT_BATCH_SIZE,
+                       commit_every=DEFAULT_COMMIT_EVERY):
+    """
+    Inserts a CSV file with multi-row INSERTs, skipping headers that map to no column.
+    Returns the number of rows inserted.
+    """
+    keep = [i for i, target in enumerate(targets) if not target.startswith("@")]
+    columns = [targets[i] for i in keep]
+    return insert_batches(conn, cursor, table, columns, csv_rows(file_path, keep), batch_size, commit_every)
+
+
+def import_table(conn, cursor, table, file_path, use_local_infile=True, batch_size=DEFAULT_BATCH_SIZE,
+                 commit_every=DEFAULT_COMMIT_EVERY):
+    """
+    Loads one CSV file, preferring LOAD DATA and falling back to multi-row INSERTs.
+    Returns (rows, local_infile_available).
+    """
+    header, terminator = read_header(file_path)
+    if not header:
+        return 0, use_local_infile
+    targets = map_columns(cursor, table, header)
+
+    start = time.perf_counter()
+    rows = None
+    if use_local_infile:
+        try:
+            rows = load_data_infile(cursor, table, file_path, targets, terminator)
+            method = "LOAD DATA"
+        except mysql.connector.Error as e:
+            if e.errno not in LOCAL_INFILE_DISABLED:
+                raise
+            use_local_infile = False
+    if rows is None:
+        rows = insert_csv_batched(conn, cursor, table, file_path, targets, batch_size, commit_every)
+        method = f"INSERT batches of {batch_size}"
+    conn.commit()
+    report(table, rows, time.perf_counter() - start, method)
+    return rows, use_local_infile
+
+
+def count_quotes(mm, begin, end):
+    """
+    Counts the '"' bytes in mm[begin:end], copying QUOTE_SCAN_BLOCK bytes at a time.
+    """
+    return sum(mm[pos:min(pos + QUOTE_SCAN_BLOCK, end)].count(b'"') for pos in range(begin, end, QUOTE_SCAN_BLOCK))
+
+
+def chunk_ranges(mm, start, chunk_size):
+    """
+    Splits mm[start:] into (begin, end) byte ranges of about chunk_size bytes that end on a
+    record boundary: a newline preceded by an even number of '"' bytes, i.e. one outside any
+    quoted field (an escaped quote is written "" and counts twice). A quoted value with
+    newlines in it, like a review body, is never split between chunks.
+    """
+    ranges = []
+    begin = start
+    scanned, quotes = start, 0
+    while begin < len(mm):
+        newline = mm.find(b"\n", begin + chunk_size - 1) if begin + chunk_size < len(mm) else -1
+        while newline != -1:
+            quotes += count_quotes(mm, scanned, newline)
+            scanned = newline
+            if quotes % 2 == 0:
+                break
+            newline = mm.find(b"\n", newline + 1)
+        end = len(mm) if newline == -1 else newline + 1
+        ranges.append((begin, end))
+        begin = end
+    return ranges
+
+
+def mmap_lines(mm, begin, end):
+    """
+    Yields the decoded lines of mm[begin:end], copying one line at a time.
+    """
+    pos = begin
+    while pos < end:
+        newline = mm.find(b"\n", pos, end)
+        stop = end if newline == -1 else newline + 1
+        yield mm[pos:stop].decode('utf-8')
+        pos = stop
+
+
+def read_schema_statements(schema_path=SCHEMA_PATH):
+    """
+    Returns the statements in schema.sql with -- comments removed.
+    Semicolons and -- inside quoted strings (e.g. SEPARATOR ';') are left alone.
+    """
+    with open(schema_path, "r") as ddl_file:
+        schema_sql = ddl_file.read()
+    statements = []
+    current = []
+    for token in re.findall(r"'(?:[^'\\]|\\.|'')*'|--[^\n]*|;|[^';-]+|.", schema_sql, re.DOTALL):
+        if token == ";":
+            statements.append("".join(current).strip())
+            current = []
+        elif not token.startswith("--"):
+            current.append(token)
+    statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def parse_create_table(statement):
+    """
+    Splits a CREATE TABLE statement into (table, items, table_options), where items are the
+    top-level column and constraint definitions. Returns None for other statements.
+    """
+    match = re.match(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\(", statement, re.IGNORECASE)
+    if not match:
+        return None
+    items = []
+    depth = 0
+    start = match.end()
+    for pos in range(match.end(), len(statement)):
+        char = statement[pos]
+        if char == "(":
+            depth += 1
+        elif char == ")" and depth > 0:
+            depth -= 1
+        elif char in ",)" and depth == 0:
+            items.append(statement[start:pos].strip())
+            start = pos + 1
+            if char == ")":
+                return match.group(1), [item for item in items if item], statement[pos + 1:].strip()
+    return None
+
+
+def foreign_keys(schema_path=SCHEMA_PATH):
+    """
+    Returns the foreign keys in schema.sql as (table, columns, parent_table, parent_columns) tuples.
+    """
+    keys = []
+    for statement in read_schema_statements(schema_path):
+        table_def = parse_create_table(statement)
+        if not table_def:
+            continue
+        table, items, _ = table_def
+        for item in items:
+            match = re.search(r"FOREIGN\s+KEY\s*\(([^)]*)\)\s*REFERENCES\s+(\w+)\s*\(([^)]*)\)", item, re.IGNORECASE)
+            if match:
+                columns = [column.strip() for column in match.group(1).split(",")]
+                parent_columns = [column.strip() for column in match.group(3).split(",")]
+                keys.append((table, columns, match.group(2), parent_columns))
+    return keys
+
+
+def table_dependencies(schema_path=SCHEMA_PATH):
+    """
+    Builds the foreign-key graph from schema.sql as {table: set of parent tables}.
+    """
+    dependencies = {}
+    for statement in read_schema_statements(schema_path):
+        table_def = parse_create_table(statement)
+        if table_def:
+            dependencies[table_def[0]] = set()
+    for table, _, parent, _ in foreign_keys(schema_path):
+        if parent != table:
+            dependencies.setdefault(table, set()).add(parent)
+    return dependencies
+
+
+def deferred_schema(schema_path=SCHEMA_PATH):
+    """
+    Rewrites schema.sql for load-then-index imports.
+    Returns (statements, deferred): statements create every table with only its primary key, and
+    deferred maps each table to the ALTER TABLE clauses that add its UNIQUE keys, secondary
+    indexes and foreign keys afterwards.
+    """
+    statements = []
+    deferred = {}
+    for statement in read_schema_statements(schema_path):
+        table_def = parse_create_table(statement)
+        index_match = re.match(r"CREATE\s+(UNIQUE\s+)?INDEX\s+(\w+)\s+ON\s+(\w+)\s*(\(.*\))\s*$",
+                               statement, re.IGNORECASE | re.DOTALL)
+        if table_def:
+            table, items, table_options = table_def
+            kept = []
+            for item in items:
+                if re.match(r"(CONSTRAINT\s+\w+\s+)?(FOREIGN\s+KEY|UNIQUE|KEY|INDEX|FULLTEXT)\b", item, re.IGNORECASE):
+                    deferred.setdefault(table, []).append(f"ADD {item}")
+                elif re.search(r"\sUNIQUE(\s+KEY)?\b", item, re.IGNORECASE):
+                    # Column-level UNIQUE, e.g. "email VARCHAR(30) UNIQUE NOT NULL"
+                    kept.append(re.sub(r"\s+UNIQUE(\s+KEY)?\b", "", item, flags=re.IGNORECASE))
+                    deferred.setdefault(table, []).append(f"ADD UNIQUE ({item.split()[0]})")
+                else:
+                    kept.append(item)
+            statements.append(f"CREATE TABLE {table} (\n    " + ",\n    ".join(kept) + f"\n) {table_options}".rstrip())
+        elif index_match:
+            unique, name, table, columns = index_match.groups()
+            deferred.setdefault(table, []).append(f"ADD {unique or ''}INDEX {name} {columns}")
+        else:
+            statements.append(statement)
+    return statements, deferred
+
+
+def find_orphans(cursor, keys):
+    """
+    Counts child rows whose foreign key has no matching parent row.
+    Returns a list of (table, columns, parent_table, orphan_count) for the keys that have orphans.
+    """
+    orphans = []
+    for table, columns, parent, parent_columns in keys:
+        not_null = " AND ".join(f"c.{column} IS NOT NULL" for column in columns)
+        matches = " AND ".join(f"p.{p_column} = c.{column}" for column, p_column in zip(columns, parent_columns))
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {table} c "
+            f"WHERE {not_null} AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE {matches});"
+        )
+        count = cursor.fetchone()[0]
+        if count:
+            orphans.append((table, columns, parent, count))
+    return orphans
+
+
+def file_fingerprint(file_path, size):
+    """
+    Returns sha256 digests of the first block of the file and of the block ending at byte size.
+    Together with the size they identify the loaded prefix without rereading the whole file.
+    """
+    with open(file_path, "rb") as f:
+        head = hashlib.sha256(f.read(min(FINGERPRINT_BLOCK, size))).hexdigest()
+        f.seek(max(0, size - FINGERPRINT_BLOCK))
+        tail = hashlib.sha256(f.read(size - max(0, size - FINGERPRINT_BLOCK))).hexdigest()
+    return head, tail
+
+
+def read_state(cursor, table):
+    """
+    Returns the import_state row for a table as a dict, or None if it was never imported.
+    """
+    cursor.execute(
+        "SELECT file_size, head_checksum, tail_checksum, row_count "
+        "FROM import_state WHERE table_name = %s;", (table,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return dict(zip(["file_size", "head_checksum", "tail_checksum", "row_count"], row))
+
+
+def write_state(cursor, table, file_path, size, row_count):
+    """
+    Records how far a table's CSV has been loaded.
+    """
+    head, tail = file_fingerprint(file_path, size)
+    cursor.execute(
+        "INSERT INTO import_state (table_name, file_size, head_checksum, tail_checksum, row_count, loaded_at) "
+        "VALUES (%s, %s, %s, %s, %s, NOW()) "
+        "ON DUPLICATE KEY UPDATE file_size = VALUES(file_size), head_checksum = VALUES(head_checksum), "
+        "tail_checksum = VALUES(tail_checksum), row_count = VALUES(row_count), loaded_at = VALUES(loaded_at);",
+        (table, size, head, tail, row_count)
+    )
+
+
+def schedule(tables, dependencies, workers, run):
+    """
+    Calls run(table) on a pool of worker threads, starting each table as soon as all of its
+    parent tables have finished. Children of a failed table are not started.
+    Returns True if every table succeeded.
+    """
+    pending = list(tables)
+    done = set()
+    failed = set()
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for table in list(pending):
+                parents = dependencies.get(table, set()) & set(tables)
+                if parents & failed:
+                    pending.remove(table)
+                    failed.add(table)
+                elif parents <= done:
+                    pending.remove(table)
+                    running[pool.submit(run, table)] = table
+            if not running:
+                break  # Remaining tables wait on each other (FK cycle)
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                table = running.pop(future)
+                if future.result():
+                    done.add(table)
+                else:
+                    failed.add(table)
+    return not failed and not pending
+
+
+class ImportJob:
+    """
+    One import of a CSV folder. Each table is loaded on its own connection from connect().
+    """
+
+    def __init__(self, connect, folder, use_local_infile=True, batch_size=DEFAULT_BATCH_SIZE,
+                 commit_every=DEFAULT_COMMIT_EVERY, workers=DEFAULT_WORKERS, chunk_workers=DEFAULT_CHUNK_WORKERS,
+                 chunk_size=DEFAULT_CHUNK_SIZE, chunk_retries=DEFAULT_CHUNK_RETRIES, defer_indexes=False,
+                 incremental=False, partitioned_tables=(), changed_tables=None):
+        self.connect = connect
+        self.folder = folder
+        self.use_local_infile = use_local_infile  # Cleared by the first worker that finds it disabled
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.workers = workers
+        self.chunk_workers = chunk_workers
+        self.chunk_size = chunk_size
+        self.chunk_retries = chunk_retries
+        # Load-then-index: tables were created by deferred_schema() and checks are off while loading
+        self.defer_indexes = defer_indexes
+        self.session_sql = DEFERRED_SESSION_SQL if defer_indexes else []
+        # Upsert only what changed since the import_state watermarks instead of loading everything
+        self.incremental = incremental
+        # Tables an incremental import upserted rows into, collected in the caller's set if given
+        self.changed_tables = set() if changed_tables is None else changed_tables
+        if not incremental:
+            self.session_sql = self.session_sql + [SKIP_ROLLUPS_SQL]
+        # Partitioned InnoDB tables cannot have foreign keys, so build_deferred() skips theirs
+        self.partitioned_tables = set(partitioned_tables)
+
+    def open(self):
+        """
+        Returns a new connection from connect() with this job's session settings applied.
+        """
+        conn = self.connect()
+        if conn and self.session_sql:
+            cursor = conn.cursor()
+            for sql_code in self.session_sql:
+                cursor.execute(sql_code)
+            cursor.close()
+        return conn
+
+    def load_table(self, table):
+        """
+        Imports <table>.csv if it exists and records its import_state watermark.
+        Returns True if successful; False otherwise.
+        """
+        file_path = os.path.join(self.folder, f"{table}.csv")
+        if not os.path.exists(file_path):
+            return True
+        size = os.path.getsize(file_path)
+        if self.incremental:
+            return self.load_table_incremental(table, file_path, size)
+        if self.chunk_workers > 1 and size > self.chunk_size:
+            rows = self.load_table_chunked(table, file_path)
+        else:
+            rows = self.load_table_whole(table, file_path)
+        return rows is not None and self.save_state(table, file_path, size, rows)
+
+    def load_table_whole(self, table, file_path):
+        """
+        Loads a CSV on one connection. Returns the number of rows loaded, or None on failure.
+        """
+        conn = self.open()
+        if not conn:
+            return None
+        cursor = conn.cursor()
+        try:
+            rows, available = import_table(conn, cursor, table, file_path, self.use_local_infile,
+                                           self.batch_size, self.commit_every)
+            if not available:
+                self.use_local_infile = False
+            return rows
+        except (mysql.connector.Error, OSError, ValueError, csv.Error) as e:
+            sys.stderr.write(f"Error importing {file_path}: {e}\n")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def save_state(self, table, file_path, size, rows):
+        """
+        Stores the import_state watermark after a table loaded. Returns True if successful; False otherwise.
+        """
+        conn = self.open()
+        if not conn:
+            return False
+        cursor = conn.cursor()
+        try:
+            write_state(cursor, table, file_path, size, rows)
+            conn.commit()
+            return True
+        except (mysql.connector.Error, OSError) as e:
+            sys.stderr.write(f"Error saving import state for {table}: {e}\n")
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+
+    def load_table_incremental(self, table, file_path, size):
+        """
+        Brings a table up to date with its CSV using the stored watermark:
+        an unchanged file is skipped, an appended-to file is upserted from the last loaded line,
+        and any other change upserts the whole file. Rows removed from the CSV are not deleted.
+        Returns True if successful; False otherwise.
+        """
+        conn = self.open()
+        if not conn:
+            return False
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        try:
+            state = read_state(cursor, table)
+            fingerprint = None
+            if state:
+                fingerprint = (state["head_checksum"], state["tail_checksum"])
+            if state and size == state["file_size"] and file_fingerprint(file_path, size) == fingerprint:
+                report(table, 0, time.perf_counter() - start, "incremental (unchanged)")
+                return True
+
+            header, _ = read_header(file_path)
+            targets = map_columns(cursor, table, header)
+            keep = [i for i, target in enumerate(targets) if not target.startswith("@")]
+            columns = [targets[i] for i in keep]
+
+            with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header_end = mm.find(b"\n") + 1
+                if (state and header_end and size > state["file_size"]
+                        and file_fingerprint(file_path, state["file_size"]) == fingerprint):
+                    # Appended rows: resume at the start of the last loaded line, in case it was
+                    # unterminated and got extended; upserting it again is harmless.
+                    begin = max(mm.rfind(b"\n", 0, state["file_size"]) + 1, header_end)
+                    previous = state["row_count"] - (1 if begin < state["file_size"] else 0)
+                    method = f"incremental upsert from byte {begin}"
+                else:
+                    begin = header_end if header_end else size
+                    previous = 0
+                    method = "incremental upsert of changed file"
+                rows = select_fields(csv.reader(mmap_lines(mm, begin, size)), keep, len(header))
+                loaded = insert_batches(conn, cursor, table, columns, rows, self.batch_size,
+                                        self.commit_every, upsert=True)
+
+            write_state(cursor, table, file_path, size, previous + loaded)
+            conn.commit()
+            if loaded:
+                self.changed_tables.add(table)
+            report(table, loaded, time.perf_counter() - start, method)
+            return True
+        except (mysql.connector.Error, OSError, ValueError, csv.Error) as e:
+            conn.rollback()
+            sys.stderr.write(f"Error importing {file_path}: {e}\n")
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+
+    def load_table_chunked(self, table, file_path):
+        """
+        Splits a large CSV into record-aligned byte ranges and loads each range on its own
+        connection, chunk_workers at a time. Each chunk is a single transaction, so a failed
+        chunk is retried up to chunk_retries times without touching the rest of the file.
+        Returns the number of rows loaded, or None if a chunk failed.
+        """
+        try:
+            with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header_end = mm.find(b"\n") + 1
+                header = next(csv.reader([mm[:header_end].decode('utf-8').rstrip("\r\n")]), [])
+                if not header or header_end == 0:
+                    return 0
+
+                conn = self.open()
+                if not conn:
+                    return None
+                cursor = conn.cursor()
+                try:
+                    targets = map_columns(cursor, table, header)
+                    max_bytes = max_packet_bytes(cursor) - PACKET_HEADROOM
+                finally:
+                    cursor.close()
+                    conn.close()
+                keep = [i for i, target in enumerate(targets) if not target.startswith("@")]
+                columns = [targets[i] for i in keep]
+
+                ranges = chunk_ranges(mm, header_end, self.chunk_size)
+
+                def load(numbered):
+                    number, (begin, end) = numbered
+                    return self.load_chunk(table, mm, columns, keep, len(header), begin, end, max_bytes,
+                                           f"chunk {number}/{len(ranges)}")
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=self.chunk_workers) as pool:
+                    results = list(pool.map(load, enumerate(ranges, 1)))
+        except (mysql.connector.Error, OSError, ValueError, csv.Error) as e:
+            sys.stderr.write(f"Error importing {file_path}: {e}\n")
+            return None
+
+        failed = [chunk for chunk, rows in zip(ranges, results) if rows is None]
+        if failed:
+            sys.stderr.write(f"{table}: {len(failed)} chunk(s) failed after retries, byte ranges: {failed}\n")
+            return None
+        report(table, sum(results), time.perf_counter() - start, f"{len(ranges)} chunks")
+        return sum(results)
+
+    def load_chunk(self, table, mm, columns, keep, width, begin, end, max_bytes, label):
+        """
+        Inserts the CSV lines in mm[begin:end] in one transaction, retrying up to chunk_retries times.
+        Blank lines are skipped; a row without width fields fails the attempt.
+        Returns the number of rows loaded, or None if every attempt failed.
+        """
+        for attempt in range(1, self.chunk_retries + 2):
+            conn = self.open()
+            if not conn:
+                continue
+            cursor = conn.cursor()
+            start = time.perf_counter()
+            try:
+                rows = select_fields(csv.reader(mmap_lines(mm, begin, end)), keep, width)
+                loaded = insert_batches(conn, cursor, table, columns, rows, self.batch_size, None, max_bytes)
+                report(f"{table} {label} (bytes {begin}-{end})", loaded, time.perf_counter() - start, "INSERT")
+                return loaded
+            except (mysql.connector.Error, ValueError, csv.Error) as e:
+                conn.rollback()
+                sys.stderr.write(f"{table} {label} (bytes {begin}-{end}) attempt {attempt} failed: {e}\n")
+            finally:
+                cursor.close()
+                conn.close()
+        return None
+
+    def build_deferred(self):
+        """
+        Adds each table's deferred indexes and constraints with a single ALTER TABLE per table.
+        Returns True if successful; False otherwise.
+        """
+        deferred = deferred_schema()[1]
+        for table in self.partitioned_tables & set(deferred):
+            deferred[table] = [clause for clause in deferred[table]
+                               if not re.match(r"ADD\s+(CONSTRAINT\s+\w+\s+)?FOREIGN\s+KEY", clause, re.IGNORECASE)]
+
+        def build(table):
+            conn = self.open()
+            if not conn:
+                return False
+            cursor = conn.cursor()
+            start = time.perf_counter()
+            try:
+                cursor.execute(f"ALTER TABLE {table} {', '.join(deferred[table])};")
+                sys.stderr.write(f"{table}: added {len(deferred[table])} indexes/constraints in "
+                                 f"{time.perf_counter() - start:.2f}s\n")
+                return True
+            except mysql.connector.Error as e:
+                sys.stderr.write(f"Error indexing {table}: {e}\n")
+                return False
+            finally:
+                cursor.close()
+                conn.close()
+
+        return schedule(list(deferred), {}, self.workers, build)
+
+    def check_integrity(self, keys=None):
+        """
+        Reports rows that violate a foreign key (possible because checks were off during the load,
+        or because a partitioned table has none). Checks every key in schema.sql unless keys is given.
+        Returns True if there are none; False otherwise.
+        """
+        conn = self.connect()
+        if not conn:
+            return False
+        cursor = conn.cursor()
+        try:
+            orphans = find_orphans(cursor, foreign_keys() if keys is None else keys)
+        except mysql.connector.Error as e:
+            sys.stderr.write(f"Error checking referential integrity: {e}\n")
+            return False
+        finally:
+            cursor.close()
+            conn.close()
+        for table, columns, parent, count in orphans:
+            sys.stderr.write(f"{table}({', '.join(columns)}) -> {parent}: {count} orphan rows\n")
+        return not orphans
+
+    def run(self, tables=TABLES):
+        """
+        Loads the tables in foreign-key order, running independent tables in parallel.
+        With defer_indexes every table loads at once, then indexes, constraints and the
+        referential-integrity check follow. Otherwise only the foreign keys of partitioned tables,
+        which the database cannot enforce, are checked after the load.
+        Returns True if successful; False otherwise.
+        """
+        if not self.defer_indexes:
+            unenforced = [key for key in foreign_keys() if key[0] in self.partitioned_tables]
+            return (schedule(tables, table_dependencies(), self.workers, self.load_table)
+                    and (not unenforced or self.check_integrity(unenforced)))
+        return (schedule(tables, {}, self.workers, self.load_table)
+                and self.build_deferred()
+                and self.check_integrity())
+
+
+def import_folder(connect, folder, tables=TABLES, **options):
+    """
+    Imports <table>.csv for every table found in the folder. See ImportJob for the options.
+    Returns True if successful; False otherwise.
+    """
+    return ImportJob(connect, folder, **options).run(tables)
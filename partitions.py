@@ -0,0 +1,177 @@
+import os
+import re
+import csv
+import gzip
+from datetime import date
+
+import loader
+
+# Optional monthly RANGE partitioning of sessions on initiate_at.
+# InnoDB does not allow foreign keys on partitioned tables and every unique key must contain the
+# partitioning column, so the partitioned layout drops the sessions foreign keys (deleteViewer and
+# insertSession enforce them instead) and uses PRIMARY KEY (sid, initiate_at).
+PARTITIONED_TABLE = "sessions"
+PARTITION_COLUMN = "initiate_at"
+DEFAULT_HISTORY_MONTHS = 24  # Monthly partitions created before the current month
+DEFAULT_AHEAD_MONTHS = 3     # Monthly partitions kept ready after the current month
+DEFAULT_ARCHIVE_DIR = "archive"
+
+
+def month_start(value):
+    """
+    Returns the first day of the month of a date, or of a "YYYY-MM" / "YYYY-MM-DD" string.
+    """
+    if isinstance(value, str):
+        value = date.fromisoformat(value if len(value) > 7 else value + "-01")
+    return value.replace(day=1)
+
+
+def add_months(month, count):
+    """
+    Returns the first day of the month count months after (or before) month.
+    """
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """
+    Names the partition holding the sessions of a month, e.g. p202501.
+    """
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def month_partitions(first_month, last_month):
+    """
+    Returns PARTITION definitions for each month from first_month through last_month.
+    """
+    definitions = []
+    month = first_month
+    while month <= last_month:
+        definitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1)}')")
+        month = add_months(month, 1)
+    return definitions
+
+
+def partition_clause(first_month, last_month):
+    """
+    Builds the PARTITION BY clause: one partition for anything older than first_month, one per
+    month, and pmax for anything newer, which add_future_partitions() splits later.
+    """
+    definitions = ([f"PARTITION p_before VALUES LESS THAN ('{first_month}')"]
+                   + month_partitions(first_month, last_month)
+                   + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+    return f"PARTITION BY RANGE COLUMNS({PARTITION_COLUMN}) (\n    " + ",\n    ".join(definitions) + "\n)"
+
+
+def partitioned_schema(statements, first_month=None, ahead=DEFAULT_AHEAD_MONTHS):
+    """
+    Rewrites the sessions CREATE TABLE in a list of schema statements for monthly partitioning.
+    first_month defaults to DEFAULT_HISTORY_MONTHS before the current month.
+    """
+    current = month_start(date.today())
+    first_month = month_start(first_month) if first_month else add_months(current, -DEFAULT_HISTORY_MONTHS)
+    rewritten = []
+    for statement in statements:
+        table_def = loader.parse_create_table(statement)
+        if not table_def or table_def[0] != PARTITIONED_TABLE:
+            rewritten.append(statement)
+            continue
+        table, items, table_options = table_def
+        kept, key_columns = [], []
+        for item in items:
+            key_match = re.match(r"PRIMARY\s+KEY\s*\((.*)\)", item, re.IGNORECASE)
+            if re.match(r"(CONSTRAINT\s+\w+\s+)?FOREIGN\s+KEY\b", item, re.IGNORECASE):
+                continue
+            if key_match:
+                key_columns += [column.strip() for column in key_match.group(1).split(",")]
+                continue
+            if re.search(r"\sPRIMARY\s+KEY\b", item, re.IGNORECASE):
+                key_columns.append(item.split()[0])
+                item = re.sub(r"\s+PRIMARY\s+KEY\b", "", item, flags=re.IGNORECASE)
+            kept.append(item)
+        if PARTITION_COLUMN not in key_columns:
+            key_columns.append(PARTITION_COLUMN)
+        kept.append(f"PRIMARY KEY ({', '.join(key_columns)})")
+        rewritten.append(f"CREATE TABLE {table} (\n    " + ",\n    ".join(kept) + f"\n) {table_options}".rstrip()
+                         + "\n" + partition_clause(first_month, add_months(current, ahead)))
+    return rewritten
+
+
+def list_partitions(cursor):
+    """
+    Returns [(partition name, upper bound date or None for MAXVALUE)] for sessions in order.
+    Returns an empty list if the table is not partitioned.
+    """
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (PARTITIONED_TABLE,),
+    )
+    partitions = []
+    for name, description in cursor.fetchall():
+        bound = description.strip("'\"")
+        partitions.append((name, None if bound.upper() == "MAXVALUE" else date.fromisoformat(bound[:10])))
+    return partitions
+
+
+def add_future_partitions(cursor, ahead=DEFAULT_AHEAD_MONTHS):
+    """
+    Splits pmax so there is a monthly partition through ahead months after the current month.
+    Returns the names of the partitions created.
+    """
+    bounds = [bound for _, bound in list_partitions(cursor) if bound]
+    if not bounds:
+        return []
+    first_month = max(bounds)
+    last_month = add_months(month_start(date.today()), ahead)
+    definitions = month_partitions(first_month, last_month)
+    if not definitions:
+        return []
+    cursor.execute(
+        f"ALTER TABLE {PARTITIONED_TABLE} REORGANIZE PARTITION pmax INTO (\n    "
+        + ",\n    ".join(definitions + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"]) + "\n)"
+    )
+    return [definition.split()[1] for definition in definitions]
+
+
+def archive_partition(cursor, name, directory):
+    """
+    Writes every row of one partition to <directory>/sessions_<name>.csv.gz, in the same CSV
+    layout as the import folder. Returns the file path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, f"{PARTITIONED_TABLE}_{name}.csv.gz")
+    cursor.execute(f"SELECT * FROM {PARTITIONED_TABLE} PARTITION ({name}) ORDER BY sid")
+    columns = [column[0] for column in cursor.description]
+    with gzip.open(file_path, "wt", newline='', encoding='utf-8') as archive:
+        writer = csv.writer(archive, lineterminator="\n")
+        writer.writerow(columns)
+        rows = cursor.fetchmany(10000)
+        while rows:
+            writer.writerows(["" if value is None else value for value in row] for row in rows)
+            rows = cursor.fetchmany(10000)
+    return file_path
+
+
+def archive_partitions(cursor, before, directory=DEFAULT_ARCHIVE_DIR):
+    """
+    Archives then drops every partition entirely older than the month before ("YYYY-MM"), and
+    removes their days from viewer_daily_sessions. Returns the archive file paths.
+    The caller rebuilds release_viewer_counts afterwards.
+    """
+    cutoff = month_start(before)
+    archived = []
+    lower = None
+    for name, bound in list_partitions(cursor):
+        if bound is None or bound > cutoff:
+            break
+        archived.append(archive_partition(cursor, name, directory))
+        if lower is None:
+            cursor.execute("DELETE FROM viewer_daily_sessions WHERE day < %s", (bound,))
+        else:
+            cursor.execute("DELETE FROM viewer_daily_sessions WHERE day >= %s AND day < %s", (lower, bound))
+        cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} DROP PARTITION {name}")
+        lower = bound
+    return archived
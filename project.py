@@ -1,44 +1,345 @@
-import mysql.connector
 import os
 import sys
+import io
 import csv
 import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+
+# The connector is only needed for the MySQL backend
+try:
+    import mysql.connector
+    from mysql.connector import pooling
+    MYSQL_ERRORS = (mysql.connector.Error,)
+except ImportError:
+    mysql = pooling = None
+    MYSQL_ERRORS = ()
+
+import cache
+import loader
+import partitions
+import results
+import server
+import snapshot
+import sqlite_backend
 
 # Configure logging (logging goes to stderr by default)
 #logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def get_connection():
+# Connection settings shared by pooled and dedicated connections
+DB_CONFIG = {
+    "user": 'test',
+    "password": 'password',
+    "database": 'cs122a',
+    "allow_local_infile": True  # Needed for LOAD DATA LOCAL INFILE
+}
+
+# Storage backend: "mysql" (the server in DB_CONFIG) or "sqlite" (an embedded database file at
+# CS122A_SQLITE_PATH, see sqlite_backend.py)
+BACKEND = os.getenv("CS122A_BACKEND", "mysql")
+SQLITE_PATH = os.getenv("CS122A_SQLITE_PATH", sqlite_backend.DEFAULT_PATH)
+
+# Errors either backend's driver raises
+DB_ERRORS = MYSQL_ERRORS + (sqlite3.Error,)
+
+# Pool size for one-off CLI runs (one command needs one connection); server and batch modes raise it
+POOL_SIZE = int(os.getenv("CS122A_POOL_SIZE", "1"))
+# Seconds to wait for a free pooled connection before giving up
+POOL_TIMEOUT = 10
+
+_pool = None
+_pool_size = POOL_SIZE
+_pool_lock = threading.Lock()
+
+# Per-thread connection override used by batch mode (see SharedConnection)
+_local = threading.local()
+
+# Commands that modify data; batch mode groups runs of them into shared transactions
+WRITE_COMMANDS = {"insertViewer", "addGenre", "deleteViewer", "insertMovie", "insertSession", "updateRelease",
+                  "rebuildRollups"}
+
+# Tables each read command reads and each write command changes (triggers and cascades included),
+# so a write invalidates only the cached results it can affect
+READ_TABLES = {
+    "listReleases": ("releases", "reviews"),
+    "popularRelease": ("release_review_counts", "releases"),
+    "releaseTitle": ("releases", "videos", "sessions"),
+    "activeViewer": ("viewers", "sessions", "viewer_daily_sessions"),
+    "videosViewed": ("videos", "release_viewer_counts"),
+}
+ROLLUP_TABLES = ("release_review_counts", "release_viewers", "release_viewer_counts", "viewer_daily_sessions")
+WRITE_TABLES = {
+    "insertViewer": ("users", "viewers", "user_genres"),
+    "addGenre": ("user_genres",),
+    "deleteViewer": ("viewers", "sessions", "reviews") + ROLLUP_TABLES,
+    "insertMovie": ("movies",),
+    "insertSession": ("sessions", "release_viewers", "release_viewer_counts", "viewer_daily_sessions"),
+    "updateRelease": ("releases",),
+    "rebuildRollups": ROLLUP_TABLES,
+    "partitions": ("sessions",) + ROLLUP_TABLES,
+}
+
+# Rows fetched per round of streaming a read command's result
+FETCH_CHUNK_ROWS = 1000
+
+# Failure message of a command that could not get a connection
+NO_CONNECTION = "cannot connect to the database"
+
+# CS122A_OUTPUT=raw prints read results straight from the server's bytes (see write_raw_rows);
+# the output is the same as the default "text" mode for every column type in schema.sql
+RAW_OUTPUT = os.getenv("CS122A_OUTPUT", "text") == "raw" and BACKEND == "mysql"
+
+# Result cache for read commands; set up by serve and batch (see cache.py), None otherwise
+_cache = None
+
+# Persistent result cache shared across processes: a SQLite file, validated against table_versions.
+# CS122A_CACHE_STALENESS lets a process trust the versions it last read for that many seconds,
+# answering repeated reads without contacting MySQL at all.
+CACHE_FILE = os.getenv("CS122A_CACHE_FILE")
+CACHE_STALENESS = float(os.getenv("CS122A_CACHE_STALENESS", "0"))
+_disk_cache = None
+
+# Successful write commands per transaction in batch mode
+BATCH_COMMIT_EVERY = 100
+
+def open_connection():
     """
-    Establish a MySQL connection with local_infile enabled.
+    Establish a new, unpooled MySQL connection with local_infile enabled.
+    Used by the importer, which needs many connections with their own session settings.
     """
     try:
-        conn = mysql.connector.connect(user='test', password='password', database='cs122a',
-            allow_local_infile=True  # Needed for LOAD DATA LOCAL INFILE
-        )
+        conn = mysql.connector.connect(**DB_CONFIG)
         #logging.info("Connected to MySQL DB successfully")
         return conn
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         #logging.error(f"Error connecting to MySQL DB: {e}")
         return None
 
-def reset_database():
+def configure_pool(size):
+    """
+    Sets the pool size. Must be called before the pool is first used; raises ValueError if the
+    pool already exists with a different size.
+    """
+    global _pool_size
+    with _pool_lock:
+        if _pool is not None and size != _pool_size:
+            raise ValueError(f"connection pool already open with {_pool_size} connections, not {size}")
+        _pool_size = size
+
+def get_pool():
+    """
+    Returns the shared connection pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Sessions are not reset on return, so prepared statements survive between borrowers
+            _pool = pooling.MySQLConnectionPool(pool_name="cs122a", pool_size=_pool_size,
+                                                pool_reset_session=False, **DB_CONFIG)
+    return _pool
+
+def get_connection():
+    """
+    Borrow a MySQL connection from the shared pool; conn.close() hands it back.
+    The pool pings the connection on checkout and reconnects it if the server dropped it.
+    Waits up to POOL_TIMEOUT seconds when every connection is in use.
+    Inside a batch, returns the batch's shared connection instead.
+    Returns None if no connection could be made.
+    """
+    shared = getattr(_local, "connection", None)
+    if shared:
+        return shared
+    if BACKEND == "sqlite":
+        try:
+            return sqlite_backend.connect(SQLITE_PATH)
+        except sqlite3.Error as e:
+            sys.stderr.write(f"Error opening SQLite database: {e}\n")
+            return None
+
+    deadline = time.monotonic() + POOL_TIMEOUT
+    while True:
+        try:
+            return PooledConnection(get_pool().get_connection())
+        except pooling.PoolError:
+            # Pool exhausted; wait for another thread to return a connection
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.005)
+        except DB_ERRORS as e:
+            sys.stderr.write(f"Error connecting to MySQL DB: {e}\n")
+            return None
+
+class PooledConnection:
+    """
+    A connection borrowed from the pool. close() rolls back anything a failed command left
+    uncommitted before handing the connection back, since the pool no longer resets sessions.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def close(self):
+        try:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+        except DB_ERRORS:
+            pass
+        finally:
+            self.conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def physical_connection(conn):
+    """
+    Unwraps batch and pool wrappers down to the underlying MySQL connection.
+    """
+    while True:
+        if isinstance(conn, (SharedConnection, PooledConnection)):
+            conn = conn.conn
+        elif pooling and isinstance(conn, pooling.PooledMySQLConnection):
+            conn = conn._cnx
+        else:
+            return conn
+
+def execute(conn, sql_code, params=()):
+    """
+    Runs sql_code as a server-side prepared statement and returns its cursor.
+    Each physical connection keeps one prepared cursor per statement, so repeated calls
+    skip parsing and planning. The cache is dropped when the connection reconnects.
+    """
+    if BACKEND == "sqlite":
+        # sqlite3 keeps its own cache of compiled statements per connection
+        return conn.cursor().execute(SQLITE_SQL.get(sql_code, sql_code), params)
+    raw = physical_connection(conn)
+    cache = getattr(raw, "_statement_cache", None)
+    if cache is None or cache[0] != raw.connection_id:
+        cache = raw._statement_cache = (raw.connection_id, {})
+    cursor = cache[1].get(sql_code)
+    if cursor is None:
+        cursor = cache[1][sql_code] = raw.cursor(prepared=True)
+    cursor.execute(sql_code, params)
+    return cursor
+
+def execute_raw(conn, sql_code, params=()):
+    """
+    Runs sql_code on a raw text-protocol cursor and returns it. Rows come back as the bytes the
+    server sent, with no conversion to Decimal/datetime; the caller closes the cursor.
+    Prepared statements use the binary protocol, whose raw values are not text, so this path
+    formats parameters client-side instead.
+    """
+    cursor = physical_connection(conn).cursor(raw=True)
+    cursor.execute(sql_code, params)
+    return cursor
+
+class SharedConnection:
+    """
+    Wraps the single connection a batch runs on. Commands use it like a normal connection,
+    but commit() only records that the command succeeded and close() does nothing;
+    the batch decides when to really commit.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.committed = False
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.committed = False
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def run_batch(lines, commit_every=BATCH_COMMIT_EVERY):
+    """
+    Runs newline-delimited, CSV-quoted commands (same syntax as argv) over one connection,
+    printing their output in order. Consecutive write commands share a transaction that is
+    committed every commit_every successful writes; a failed write is rolled back to its
+    savepoint without losing the rest. Any other command commits pending writes first.
+    Returns 0 if every command ran; 1 otherwise.
+    """
+    conn = get_connection()
+    if not conn:
+        sys.stdout.write("Fail")
+        return 1
+
+    shared = SharedConnection(conn)
+    _local.connection = shared
+    cursor = conn.cursor()
+    status = 0
+    pending = 0
+    try:
+        for argv in csv.reader(lines):
+            if not argv or argv[0].startswith("#"):
+                continue
+            if argv[0] in WRITE_COMMANDS:
+                cursor.execute("SAVEPOINT batch_command;")
+                shared.committed = False
+                try:
+                    run_command(argv)
+                except Exception as e:
+                    print("Fail", e)
+                if shared.committed:
+                    cursor.execute("RELEASE SAVEPOINT batch_command;")
+                    pending += 1
+                else:
+                    cursor.execute("ROLLBACK TO SAVEPOINT batch_command;")
+                if pending >= commit_every:
+                    conn.commit()
+                    pending = 0
+            else:
+                conn.commit()
+                pending = 0
+                if argv[0] in ("batch", "serve"):
+                    print("Fail")
+                    status = 1
+                    continue
+                try:
+                    status |= run_command(argv)
+                except Exception as e:
+                    print("Fail", e)
+                    status = 1
+                conn.commit()  # End the read's snapshot so later commands see fresh data
+        conn.commit()
+    except DB_ERRORS as e:
+        print("Fail", e)
+        status = 1
+    finally:
+        _local.connection = None
+        cursor.close()
+        conn.close()
+    return status
+
+def reset_database(defer_indexes=False, partition_sessions=False):
     """
     Deletes all tables and recreates them using schema.sql.
+    With defer_indexes the tables get only their primary keys; the import adds the rest afterwards.
+    With partition_sessions (True or the first "YYYY-MM" month) sessions is partitioned by month.
     Returns True if successful; False otherwise.
     """
     conn = get_connection()
     if not conn:
         return False
+    if BACKEND == "sqlite":
+        try:
+            return sqlite_backend.reset_database(conn)
+        finally:
+            conn.close()
 
     cursor = conn.cursor()
     try:
         cursor.execute("USE cs122a;")
 
-        # Drop tables in order (child tables first)
-        tables = ["reviews", "sessions", "videos", "series", "movies", "releases", "producers", "viewers", "users"]
-        for table in tables:
-            cursor.execute(f"DROP TABLE IF EXISTS {table};")
-            #logging.info(f"Dropped table {table}")
+        # No per-table DROPs: schema.sql starts with DROP DATABASE, which removes every table
+        # (rollups and other later additions included) whatever foreign keys point at it
 
         # Read and execute schema.sql
         schema_path = os.path.join(os.path.dirname(__file__), "schema.sql")
@@ -46,14 +347,18 @@ def reset_database():
             #logging.error(f"Error: schema.sql file not found at {schema_path}!")
             return False
 
-        with open(schema_path, "r") as ddl_file:
-            schema_sql = ddl_file.read()
-            for statement in schema_sql.split(";"):
-                if statement.strip():
-                    cursor.execute(statement)
-            #logging.info("Recreated tables from schema.sql.")
+        if defer_indexes:
+            statements = loader.deferred_schema(schema_path)[0]
+        else:
+            statements = loader.read_schema_statements(schema_path)
+        if partition_sessions:
+            first_month = None if partition_sessions is True else partition_sessions
+            statements = partitions.partitioned_schema(statements, first_month)
+        for statement in statements:
+            cursor.execute(statement)
+        #logging.info("Recreated tables from schema.sql.")
 
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         #logging.error(f"Error resetting database: {e}")
         return False
     finally:
@@ -63,46 +368,118 @@ def reset_database():
 
     return True
 
-def import_csv_with_insert(folder):
+def import_csv_with_insert(folder, **options):
+    """
+    Reads CSV files from the given folder and inserts data using multi-row INSERT INTO statements.
+    Options (batch_size, commit_every, workers, chunk_*, defer_indexes, incremental) are passed to loader.ImportJob.
+    Returns True if successful; False otherwise.
+    """
+    return loader.import_folder(open_connection, folder, use_local_infile=False, **options)
+
+def import_csv_with_load_data(folder, **options):
+    """
+    Loads CSV files from the given folder with LOAD DATA LOCAL INFILE, falling back to
+    batched INSERTs when the server has local_infile disabled.
+    Returns True if successful; False otherwise.
+    """
+    return loader.import_folder(open_connection, folder, **options)
+
+def import_csv_with_sqlite(folder, **options):
     """
-    Reads CSV files from the given folder and inserts data using INSERT INTO.
+    Loads CSV files from the given folder into the SQLite database in one transaction.
     Returns True if successful; False otherwise.
     """
     conn = get_connection()
     if not conn:
-        #logging.error("Unable to establish a connection. Aborting import.")
         return False
+    try:
+        return sqlite_backend.import_folder(conn, folder)
+    finally:
+        conn.close()
 
+def import_snapshot(tables, batch_size=loader.DEFAULT_BATCH_SIZE, commit_every=loader.DEFAULT_COMMIT_EVERY):
+    """
+    Inserts memory-mapped snapshot tables (see snapshot.py) in foreign-key order with multi-row
+    INSERTs, decoding each row as its batch is sent.
+    Returns True if successful; False otherwise.
+    """
+    conn = get_connection() if BACKEND == "sqlite" else open_connection()
+    if not conn:
+        return False
     cursor = conn.cursor()
-    # Import tables in the correct order
-    tables = ["users", "producers", "viewers", "releases", "movies", "series", "videos", "sessions", "reviews"]
-
-    for table in tables:
-        file_path = os.path.join(folder, f"{table}.csv")
-        if not os.path.exists(file_path):
-            #logging.warning(f"File {file_path} not found. Skipping.")
-            continue
+    try:
+        execute(conn, SKIP_ROLLUPS_SQL)  # The import rebuilds the rollups once at the end
+        # SQLite has no packet limit, only the statement's variable limit that batch_size bounds
+        max_bytes = sys.maxsize if BACKEND == "sqlite" else None
+        for table in loader.TABLES:
+            if table not in tables:
+                continue
+            start = time.perf_counter()
+            rows = loader.insert_batches(conn, cursor, table, list(tables[table].kinds),
+                                         snapshot.text_rows(tables[table]), batch_size, commit_every, max_bytes)
+            loader.report(table, rows, time.perf_counter() - start, "snapshot")
+        return True
+    except DB_ERRORS as e:
+        sys.stderr.write(f"Error loading snapshot: {e}\n")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
 
+def import_settings(options):
+    """
+    Converts import command options into loader.ImportJob keyword arguments.
+    Returns None if a value is not an integer within range.
+    """
+    names = {
+        # name: (default, minimum)
+        "batch_size": (loader.DEFAULT_BATCH_SIZE, 1),
+        "commit_every": (loader.DEFAULT_COMMIT_EVERY, 1),
+        "workers": (loader.DEFAULT_WORKERS, 1),
+        "chunk_workers": (loader.DEFAULT_CHUNK_WORKERS, 1),
+        "chunk_size": (loader.DEFAULT_CHUNK_SIZE, 1),
+        "chunk_retries": (loader.DEFAULT_CHUNK_RETRIES, 0),
+    }
+    settings = {}
+    for name, (default, minimum) in names.items():
         try:
-            #logging.info(f"Importing {table}.csv into table {table}...")
-            with open(file_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                columns = next(reader)  # Read header row
-                if not columns:
-                    continue
-                placeholders = ', '.join(['%s'] * len(columns))
-                insert_query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
-                for row in reader:
-                    cursor.execute(insert_query, row)
-            conn.commit()
-            #logging.info(f"Successfully imported {table}.csv")
-        except mysql.connector.Error as e:
-            #logging.error(f"Error importing {table}.csv: {e}")
-            return False
+            settings[name] = int(options.get(name, default))
+        except ValueError:
+            return None
+        if settings[name] < minimum:
+            return None
+    settings["defer_indexes"] = bool(options.get("defer_indexes"))
+    settings["incremental"] = bool(options.get("incremental"))
+    if settings["defer_indexes"] and settings["incremental"]:
+        return None
+    # --partition-sessions[=YYYY-MM] only applies when the schema is recreated
+    partition_sessions = options.get("partition_sessions")
+    if partition_sessions:
+        if settings["incremental"]:
+            return None
+        if partition_sessions is not True:
+            try:
+                partitions.month_start(partition_sessions)
+            except ValueError:
+                return None
+    settings["partitioned_tables"] = [partitions.PARTITIONED_TABLE] if partition_sessions else []
+    # The SQLite backend only does plain full imports
+    if BACKEND == "sqlite" and (settings["defer_indexes"] or settings["incremental"] or partition_sessions):
+        return None
+    return settings
 
-    cursor.close()
-    conn.close()
-    return True
+def parse_options(args):
+    """
+    Splits command arguments into positional values and --name[=value] options.
+    """
+    positional, options = [], {}
+    for arg in args:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name.replace("-", "_")] = value if value else True
+        else:
+            positional.append(arg)
+    return positional, options
 
 def verify_data():
     """
@@ -122,331 +499,954 @@ def verify_data():
         cursor.execute("SELECT COUNT(*) FROM releases;")
         releases_count = cursor.fetchone()[0]
         return users_count > 0 and producers_count > 0 and releases_count > 0
-    except mysql.connector.Error as e:
+    except DB_ERRORS as e:
         #logging.error(f"Error verifying data: {e}")
          print("False")
     finally:
         cursor.close()
         conn.close()
 
+# Command SQL. Every statement is a constant so execute() can reuse its prepared form.
+USER_EXISTS_SQL = "SELECT COUNT(*) FROM users WHERE uid = %s"
+INSERT_USER_SQL = (
+    "INSERT INTO users (uid, email, joined_date, nickname, street, city, state, zip) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+)
+INSERT_VIEWER_SQL = "INSERT INTO viewers (uid, first_name, last_name, subscription) VALUES (%s, %s, %s, %s)"
+INSERT_USER_GENRE_SQL = "INSERT INTO user_genres (uid, seq, genre) VALUES (%s, %s, %s)"
+# addGenre locks the user's row first, so two calls for one user cannot both take the same seq
+LOCK_USER_SQL = "SELECT uid FROM users WHERE uid = %s FOR UPDATE"
+USER_HAS_GENRE_SQL = "SELECT COUNT(*) FROM user_genres WHERE uid = %s AND genre = %s"
+# Appends after the user's last genre
+ADD_GENRE_SQL = (
+    "INSERT INTO user_genres (uid, seq, genre) "
+    "SELECT %s, COALESCE(MAX(seq), 0) + 1, %s FROM user_genres WHERE uid = %s"
+)
+# After an import: splits each loaded users.genres list into user_genres, after any genres the
+# user already has, then clears the staging column. Repeats (any case) are skipped, so the plain
+# INSERT only fails on a genre that does not fit.
+SPLIT_GENRES_SQL = (
+    "INSERT INTO user_genres (uid, seq, genre) "
+    "WITH RECURSIVE parts (uid, seq, genre, rest) AS ("
+    "SELECT uid, 1, SUBSTRING_INDEX(genres, ';', 1), "
+    "SUBSTRING(genres, CHAR_LENGTH(SUBSTRING_INDEX(genres, ';', 1)) + 2) "
+    "FROM users WHERE genres IS NOT NULL "
+    "UNION ALL "
+    "SELECT uid, seq + 1, SUBSTRING_INDEX(rest, ';', 1), "
+    "SUBSTRING(rest, CHAR_LENGTH(SUBSTRING_INDEX(rest, ';', 1)) + 2) "
+    "FROM parts WHERE rest <> ''"
+    ") "
+    "SELECT p.uid, COALESCE(m.last_seq, 0) + p.seq, TRIM(p.genre) "
+    "FROM parts p "
+    "LEFT JOIN (SELECT uid, MAX(seq) AS last_seq FROM user_genres GROUP BY uid) m ON m.uid = p.uid "
+    "WHERE TRIM(p.genre) <> '' "
+    "AND NOT EXISTS (SELECT 1 FROM user_genres g WHERE g.uid = p.uid AND g.genre = TRIM(p.genre)) "
+    "AND NOT EXISTS (SELECT 1 FROM parts q WHERE q.uid = p.uid AND q.seq < p.seq AND TRIM(q.genre) = TRIM(p.genre))"
+)
+CLEAR_GENRES_SQL = "UPDATE users SET genres = NULL WHERE genres IS NOT NULL"
+TABLE_VERSIONS_SQL = "SELECT table_name, version FROM table_versions"
+BUMP_VERSIONS_SQL = "UPDATE table_versions SET version = version + 1 WHERE FIND_IN_SET(table_name, %s)"
+BUMP_ALL_VERSIONS_SQL = "UPDATE table_versions SET version = version + 1"
+INSERT_MOVIE_SQL = "INSERT INTO movies (rid, website_url) VALUES (%s, %s)"
+DELETE_VIEWER_SQL = "DELETE FROM viewers WHERE uid = %s"
+# Triggers do not fire for the cascaded review deletes, so the counts are taken off first
+DELETE_VIEWER_REVIEW_COUNTS_SQL = (
+    "UPDATE release_review_counts c "
+    "JOIN (SELECT rid, COUNT(*) AS n FROM reviews WHERE uid = %s GROUP BY rid) d ON c.rid = d.rid "
+    "SET c.review_count = c.review_count - d.n"
+)
+DELETE_VIEWER_VIEWER_COUNTS_SQL = (
+    "UPDATE release_viewer_counts c "
+    "JOIN release_viewers rv ON rv.rid = c.rid "
+    "SET c.viewer_count = c.viewer_count - 1 "
+    "WHERE rv.uid = %s"
+)
+# Explicit because a partitioned sessions table has no foreign keys to cascade from
+DELETE_VIEWER_SESSIONS_SQL = "DELETE FROM sessions WHERE uid = %s"
+# Checks the viewer, the video and sid uniqueness itself, since a partitioned sessions table has
+# no foreign keys and its primary key is (sid, initiate_at); inserts no row if a check fails
+INSERT_SESSION_SQL = (
+    "INSERT INTO sessions (sid, uid, rid, ep_num, initiate_at, leave_at, quality, device) "
+    "SELECT %s, v.uid, vd.rid, vd.ep_num, %s, %s, %s, %s "
+    "FROM viewers v JOIN videos vd ON vd.rid = %s AND vd.ep_num = %s "
+    "WHERE v.uid = %s AND NOT EXISTS (SELECT 1 FROM sessions s WHERE s.sid = %s)"
+)
+UPDATE_RELEASE_SQL = "UPDATE releases SET title = %s WHERE rid = %s"
+LIST_RELEASES_SQL = (
+    "SELECT DISTINCT r.rid, r.genre, r.title "
+    "FROM releases r "
+    "JOIN reviews rev ON r.rid = rev.rid "
+    "WHERE rev.uid = %s "
+    "ORDER BY r.title ASC"
+)
+POPULAR_RELEASE_SQL = (
+    "SELECT c.rid, r.title, c.review_count AS reviewCount "
+    "FROM release_review_counts c "
+    "JOIN releases r ON r.rid = c.rid "
+    "ORDER BY c.review_count DESC, c.rid DESC "
+    "LIMIT %s"
+)
+RELEASE_TITLE_SQL = (
+    "SELECT r.rid, r.title AS release_title, r.genre, v.title AS video_title, v.ep_num, v.length "
+    "FROM releases r "
+    "JOIN videos v ON r.rid = v.rid "
+    "JOIN sessions s ON v.rid = s.rid AND v.ep_num = s.ep_num "
+    "WHERE s.sid = %s "
+    "ORDER BY r.title ASC"
+)
+ACTIVE_VIEWER_SQL = (
+    "SELECT v.uid, v.first_name, v.last_name "
+    "FROM viewers v "
+    "JOIN sessions s ON v.uid = s.uid "
+    "WHERE s.initiate_at BETWEEN %s AND %s "
+    "GROUP BY v.uid "
+    "HAVING COUNT(s.sid) >= %s "
+    "ORDER BY v.uid ASC"
+)
+# activeViewer over a range containing whole days: day buckets for the whole days,
+# raw sessions for the partial days at either edge
+ACTIVE_VIEWER_DAILY_SQL = (
+    "SELECT v.uid, v.first_name, v.last_name "
+    "FROM viewers v "
+    "JOIN ("
+    "SELECT uid, session_count AS n FROM viewer_daily_sessions WHERE day BETWEEN %s AND %s "
+    "UNION ALL "
+    "SELECT uid, COUNT(*) AS n FROM sessions WHERE initiate_at >= %s AND initiate_at < %s GROUP BY uid "
+    "UNION ALL "
+    "SELECT uid, COUNT(*) AS n FROM sessions WHERE initiate_at >= %s AND initiate_at <= %s GROUP BY uid"
+    ") a ON a.uid = v.uid "
+    "GROUP BY v.uid "
+    "HAVING SUM(a.n) >= %s "
+    "ORDER BY v.uid ASC"
+)
+VIDEOS_VIEWED_SQL = (
+    "SELECT v.rid, v.ep_num, v.title, v.length, COALESCE(c.viewer_count, 0) AS viewers "
+    "FROM videos v "
+    "LEFT JOIN release_viewer_counts c ON c.rid = v.rid "
+    "WHERE v.rid = %s "
+    "ORDER BY v.rid DESC, v.ep_num ASC"
+)
+
+# Statements that recompute each summary table from its base tables, for rebuildRollups
+ROLLUP_REBUILDS = {
+    "release_review_counts": [
+        "DELETE FROM release_review_counts",
+        "INSERT INTO release_review_counts (rid, review_count) "
+        "SELECT r.rid, COUNT(rev.rvid) FROM releases r LEFT JOIN reviews rev ON rev.rid = r.rid "
+        "GROUP BY r.rid",
+    ],
+    # Rebuilds the (rid, uid) set first, then counts it
+    "release_viewer_counts": [
+        "DELETE FROM release_viewers",
+        "INSERT INTO release_viewers (rid, uid) SELECT DISTINCT rid, uid FROM sessions",
+        "DELETE FROM release_viewer_counts",
+        "INSERT INTO release_viewer_counts (rid, viewer_count) "
+        "SELECT rid, COUNT(*) FROM release_viewers GROUP BY rid",
+    ],
+    "viewer_daily_sessions": [
+        "DELETE FROM viewer_daily_sessions",
+        "INSERT INTO viewer_daily_sessions (day, uid, session_count) "
+        "SELECT DATE(initiate_at), uid, COUNT(*) FROM sessions GROUP BY DATE(initiate_at), uid",
+    ],
+}
+
+# Rollups an incremental import rebuilds after upserting into a base table. ON DUPLICATE KEY UPDATE
+# fires no AFTER INSERT trigger for a row that already existed, so a changed session (new rid, uid
+# or initiate_at) would leave these stale; reviews has an AFTER UPDATE trigger instead.
+UPSERT_ROLLUPS = {
+    "sessions": ["release_viewer_counts", "viewer_daily_sessions"],
+}
+
+# Keeps the rollup triggers from double counting rows a rebuild inserts
+SKIP_ROLLUPS_SQL = "SET @cs122a_skip_rollups = 1"
+RESUME_ROLLUPS_SQL = "SET @cs122a_skip_rollups = NULL"
+
+# Statements that need different SQL on the SQLite backend. Everything else runs there after
+# sqlite_backend.translate_sql() (placeholders, INSERT IGNORE).
+SQLITE_SQL = {
+    # SQLite fires triggers for cascaded deletes, so the reviews trigger already does this
+    DELETE_VIEWER_REVIEW_COUNTS_SQL: "SELECT ? WHERE 0",
+    DELETE_VIEWER_VIEWER_COUNTS_SQL: (
+        "UPDATE release_viewer_counts SET viewer_count = viewer_count - 1 "
+        "WHERE rid IN (SELECT rid FROM release_viewers WHERE uid = ?)"
+    ),
+    SPLIT_GENRES_SQL: (
+        "WITH RECURSIVE parts (uid, seq, genre, rest) AS ("
+        "SELECT uid, 0, '', genres || ';' FROM users WHERE genres IS NOT NULL "
+        "UNION ALL "
+        "SELECT uid, seq + 1, substr(rest, 1, instr(rest, ';') - 1), substr(rest, instr(rest, ';') + 1) "
+        "FROM parts WHERE rest <> ''"
+        ") "
+        "INSERT INTO user_genres (uid, seq, genre) "
+        "SELECT p.uid, COALESCE(m.last_seq, 0) + p.seq, TRIM(p.genre) "
+        "FROM parts p "
+        "LEFT JOIN (SELECT uid, MAX(seq) AS last_seq FROM user_genres GROUP BY uid) m ON m.uid = p.uid "
+        "WHERE p.seq > 0 AND TRIM(p.genre) <> '' "
+        "AND NOT EXISTS (SELECT 1 FROM user_genres g WHERE g.uid = p.uid AND g.genre = TRIM(p.genre)) "
+        "AND NOT EXISTS (SELECT 1 FROM parts q WHERE q.uid = p.uid AND q.seq > 0 AND q.seq < p.seq "
+        "AND TRIM(q.genre) = TRIM(p.genre) COLLATE ai_ci)"
+    ),
+    # SQLite has no FOR UPDATE; a no-op write takes its database write lock instead
+    LOCK_USER_SQL: "UPDATE users SET uid = uid WHERE uid = ? RETURNING uid",
+    BUMP_VERSIONS_SQL: (
+        "UPDATE table_versions SET version = version + 1 "
+        "WHERE instr(',' || ? || ',', ',' || table_name || ',') > 0"
+    ),
+    # The SQLite triggers have no session flag to set
+    SKIP_ROLLUPS_SQL: "SELECT 1 WHERE 0",
+    RESUME_ROLLUPS_SQL: "SELECT 1 WHERE 0",
+}
+
+# Read commands build (sql, params) here so explain_check.py can EXPLAIN exactly what they run
+def list_releases_query(uid):
+    return LIST_RELEASES_SQL, (uid,)
+
+def popular_release_query(num):
+    return POPULAR_RELEASE_SQL, (int(num),)
+
+def release_title_query(sid):
+    return RELEASE_TITLE_SQL, (sid,)
+
+def active_viewer_query(N, start, end):
+    """
+    Uses the daily rollup when [start, end] covers at least one whole day, otherwise the raw sessions.
+    Both return the same rows as BETWEEN start AND end over sessions.
+    """
+    N = int(N)  # SQLite compares a text parameter with COUNT() as text
+    try:
+        start_at, end_at = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    except (TypeError, ValueError):
+        return ACTIVE_VIEWER_SQL, (start, end, N)
+    midnight, last_second = datetime.min.time(), datetime.max.time().replace(microsecond=0)
+    first_day = start_at.date() if start_at.time() == midnight else start_at.date() + timedelta(days=1)
+    last_day = end_at.date() if end_at.time() >= last_second else end_at.date() - timedelta(days=1)
+    if start_at.tzinfo or end_at.tzinfo:
+        return ACTIVE_VIEWER_SQL, (start, end, N)
+    if first_day > last_day:
+        # Datetimes rather than the text given, so a date-only end means its midnight on SQLite
+        # too, which stores initiate_at as text
+        return ACTIVE_VIEWER_SQL, (start_at, end_at, N)
+    return ACTIVE_VIEWER_DAILY_SQL, (first_day, last_day,
+                                     start_at, datetime.combine(first_day, midnight),
+                                     datetime.combine(last_day + timedelta(days=1), midnight), end_at, N)
+
+def videos_viewed_query(rid):
+    return VIDEOS_VIEWED_SQL, (rid,)
+
+READ_QUERIES = {
+    "listReleases": list_releases_query,
+    "popularRelease": popular_release_query,
+    "releaseTitle": release_title_query,
+    "activeViewer": active_viewer_query,
+    "videosViewed": videos_viewed_query,
+}
+
 def insertViewer(data):
     # Order:
     # [uid, email, nickname, street, city, state, zip, genres, joined_date, first, last, subscription]
 
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return results.Failure(NO_CONNECTION)
     uid, email, nickname, street, city, state, zip_code, genres, joined_date, first, last, subscription = data
     try:
         # Check if uid already exists
-        cursor.execute(f"SELECT COUNT(*) FROM users WHERE uid ='{uid}'")
-        if cursor.fetchone()[0] > 0:
-            print("Fail")
-            return
+        if execute(conn, USER_EXISTS_SQL, (uid,)).fetchall()[0][0] > 0:
+            return results.Failure()
 
         # First need to insert into User table, then we will insert into viewer table.
-
-        user_sql_code = (
-            f"INSERT INTO users (uid, email, joined_date, nickname, street, city, state, zip, genres) "
-            f"VALUES ({uid}, '{email}', '{joined_date}', '{nickname}', '{street}', '{city}', '{state}', '{zip_code}', '{genres}');"
-        )
-        cursor.execute(user_sql_code)
+        execute(conn, INSERT_USER_SQL, (uid, email, joined_date, nickname, street, city, state, zip_code))
+        # Keeps the first of any repeats (any case), which the unique key would reject
+        genre_list, seen = [], set()
+        for genre in (genre.strip() for genre in genres.split(";")):
+            if genre and sqlite_backend.collation_key(genre) not in seen:
+                seen.add(sqlite_backend.collation_key(genre))
+                genre_list.append(genre)
+        for seq, genre in enumerate(genre_list, 1):
+            execute(conn, INSERT_USER_GENRE_SQL, (uid, seq, genre))
 
         # now to insert into viewer the extra information
-        viewer_sql_code = (
-            f"INSERT INTO viewers (uid, first_name, last_name, subscription) "
-            f"VALUES ({uid}, '{first}', '{last}', '{subscription}');"
-        )
-        cursor.execute(viewer_sql_code)
+        execute(conn, INSERT_VIEWER_SQL, (uid, first, last, subscription))
 
-        conn.commit()
-        print("Success")
+        commit_write(conn, "insertViewer")
+        return results.SUCCESS
 
     except Exception as e:
-        print("Fail", e)
+        return results.Failure(str(e))
     finally:
-        cursor.close()
         conn.close()
 
 def addGenre(data):
     uid, genre = data
 
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return results.Failure(NO_CONNECTION)
     try:
-        cursor.execute("SELECT genres FROM users WHERE uid = %s;", (uid,))
-        result = cursor.fetchone()
-        if not result:
-            # If no user found
-            print("Fail")
-            return
-
-        current_genres = result[0]
-        if not current_genres or current_genres.strip() == "":
-            # If empty, just add it
-            new_genres = genre
-        else:
-            # Compare in a case-insensitive way or as specified
-            genres_list_lower = [g.strip().lower() for g in current_genres.split(';')]
-            if genre.lower() in genres_list_lower:
-                # If it's already there, print "Fail" (not specified in documenation)
-                print("Fail")
-                return
-            else:
-                # Otherwise append it
-                new_genres = current_genres + ";" + genre
-
-        cursor.execute("UPDATE users SET genres = %s WHERE uid = %s;", (new_genres, uid))
-        conn.commit()
-        print("Success")
+        # Fails for an unknown user, or a genre the user already has (any case)
+        if not execute(conn, LOCK_USER_SQL, (uid,)).fetchall():
+            return results.Failure()
+        if execute(conn, USER_HAS_GENRE_SQL, (uid, genre)).fetchall()[0][0] > 0:
+            return results.Failure()
+        execute(conn, ADD_GENRE_SQL, (uid, genre, uid))
+        commit_write(conn, "addGenre")
+        return results.SUCCESS
     except Exception as e:
-        print("Fail", e)
+        return results.Failure(str(e))
     finally:
-        cursor.close()
         conn.close()
 
 def insertMovie(data):
     conn = get_connection()
-    cursor = conn.cursor()
-    rid,website_url = data
+    if not conn:
+        return results.Failure(NO_CONNECTION)
+    rid, website_url = data
 
     try:
-        sql_code = (
-            f"INSERT INTO movies (rid, website_url) "
-            f"VALUES ('{rid}','{website_url}');"
-        )
-        cursor.execute(sql_code)
-        conn.commit()
-        print("Success")
+        execute(conn, INSERT_MOVIE_SQL, (rid, website_url))
+        commit_write(conn, "insertMovie")
+        return results.SUCCESS
 
     except Exception as e:
-        print("Fail", e)
+        return results.Failure(str(e))
     finally:
-        cursor.close()
         conn.close()
 
 def deleteViewer(data):
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return results.Failure(NO_CONNECTION)
     uid = data
 
     try:
-        sql_code = (
-            f"DELETE FROM viewers "
-            f"WHERE uid = '{uid}';"
-        )
-        cursor.execute(sql_code)
-        conn.commit()
-        print("Success")
+        execute(conn, DELETE_VIEWER_REVIEW_COUNTS_SQL, (uid,))
+        execute(conn, DELETE_VIEWER_VIEWER_COUNTS_SQL, (uid,))
+        execute(conn, DELETE_VIEWER_SESSIONS_SQL, (uid,))
+        execute(conn, DELETE_VIEWER_SQL, (uid,))
+        commit_write(conn, "deleteViewer")
+        return results.SUCCESS
 
     except Exception as e:
-        print("Fail", e)
+        return results.Failure(str(e))
     finally:
-        cursor.close()
         conn.close()
 
 def insertSession(data):
     sid, uid, rid, ep_num, initiate_at, leave_at, quality, device = data
 
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return results.Failure(NO_CONNECTION)
     try:
-        sql_code = (
-            f"INSERT INTO sessions (sid, uid, rid, ep_num, initiate_at, leave_at, quality, device) "
-            f"VALUES ({sid}, {uid}, {rid}, {ep_num}, '{initiate_at}', '{leave_at}', '{quality}', '{device}');"
-        )
-        cursor.execute(sql_code)
-        conn.commit()
-        print("Success")
+        cursor = execute(conn, INSERT_SESSION_SQL,
+                         (sid, initiate_at, leave_at, quality, device, rid, ep_num, uid, sid))
+        if cursor.rowcount == 0:
+            raise ValueError("no such viewer or video, or sid already exists")
+        commit_write(conn, "insertSession")
+        return results.SUCCESS
     except Exception as e:
-        print("Fail", e)
+        return results.Failure(str(e))
     finally:
-        cursor.close()
         conn.close()
 
 def updateRelease(data):
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return results.Failure(NO_CONNECTION)
 
     rid, title = data
     try:
-        sql_code = f"UPDATE releases SET title = '{title}' WHERE rid = {rid};"
-        cursor.execute(sql_code)
-        conn.commit()
-        print("Success")
+        execute(conn, UPDATE_RELEASE_SQL, (title, rid))
+        commit_write(conn, "updateRelease")
+        return results.SUCCESS
     except Exception as e:
-        print("Fail", e)
+        return results.Failure(str(e))
     finally:
-        cursor.close()
         conn.close()
 
-def listReleases(data):
-    conn = get_connection()
-    cursor = conn.cursor()
-    uid = data
+def configure_cache(options):
+    """
+    Sets up the result cache from --cache-size=N (entries, 0 disables), --cache-bytes=N and
+    --cache-ttl=SECONDS. Returns False if an option is invalid.
+    """
+    global _cache
+    try:
+        size = int(options.get("cache_size", cache.DEFAULT_MAX_ENTRIES))
+        max_bytes = int(options.get("cache_bytes", cache.DEFAULT_MAX_BYTES))
+        ttl = float(options.get("cache_ttl", cache.DEFAULT_TTL))
+    except ValueError:
+        return False
+    if size < 0 or max_bytes < 0 or ttl < 0:
+        return False
+    _cache = cache.ResultCache(size, max_bytes, ttl) if size and max_bytes and ttl else None
+    return True
+
+def get_disk_cache():
+    """
+    Opens the CS122A_CACHE_FILE cache on first use. Returns None if it is not configured or
+    cannot be opened.
+    """
+    global _disk_cache
+    if _disk_cache is None and CACHE_FILE:
+        try:
+            _disk_cache = cache.DiskCache(CACHE_FILE, max_staleness=CACHE_STALENESS)
+        except (OSError, sqlite3.Error) as e:
+            sys.stderr.write(f"Error opening cache file: {e}\n")
+    return _disk_cache
 
+def fetch_table_versions(conn, tables):
+    """
+    Reads every table_versions counter, remembers them in the disk cache and returns the
+    versions of tables. Returns None if the database has no table_versions table.
+    """
     try:
-        sql_code = (
-            f"SELECT DISTINCT r.rid, r.genre, r.title "
-            f"FROM releases r "
-            f"JOIN reviews rev ON r.rid = rev.rid "
-            f"WHERE rev.uid = {uid} "
-            f"ORDER BY r.title ASC;"
-        )
-        cursor.execute(sql_code)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            print(",".join(str(x) for x in row))
-    except Exception as e:
-        print("Fail", e)
-    finally:
-        cursor.close()
-        conn.close()
+        versions = {table: str(version) for table, version in execute(conn, TABLE_VERSIONS_SQL).fetchall()}
+    except DB_ERRORS:
+        return None
+    get_disk_cache().save_versions(versions)
+    if any(table not in versions for table in tables):
+        return None
+    return tuple(versions[table] for table in tables)
 
-def popularRelease(data):
+def require_connection():
+    """
+    Returns get_connection(), raising ConnectionError instead of returning None.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        raise ConnectionError(NO_CONNECTION)
+    return conn
 
-    num = int(data[0])
+def read_row_chunks(command, args, query, raw=None):
+    """
+    Yields the rows of a read command's (sql, params) query in lists of at most FETCH_CHUNK_ROWS,
+    streaming from an unbuffered cursor so memory stays flat for any result size. A cached
+    result is yielded as one list. Raises ConnectionError if no connection can be made.
+    Results up to cache.MAX_CACHED_ROWS rows are cached as they stream by. Versions are read
+    before the query, so a result is never tagged newer than its data.
+    Rows hold raw bytes if raw (default: RAW_OUTPUT), converted values otherwise.
+    """
+    if raw is None:
+        raw = RAW_OUTPUT
+    tables = READ_TABLES[command]
+    key = (command, tuple(str(arg) for arg in args)) + (("raw",) if raw else ())
+    if _cache is not None:
+        rows = _cache.get(key)
+        if rows is not None:
+            yield rows
+            return
+        snapshot = _cache.snapshot(tables)
+    disk_cache = get_disk_cache()
+    versions = None
+    conn = None
+    kept = None
     try:
-        sql_code = (
-            f"SELECT R.rid, R.title, COUNT(Rev.rvid) as reviewCount "
-            f"FROM releases R "
-            f"LEFT JOIN reviews Rev ON R.rid = Rev.rid "
-            f"GROUP BY R.rid, R.title "
-            f"ORDER by reviewCount DESC, R.rid DESC "
-            f"LIMIT {num}; "
-        )
-        cursor.execute(sql_code)
-        rows = cursor.fetchall()
-        for row in rows:
-            print(",".join(str(x) for x in row))
-    except Exception as e:
-        print("Fail", e)
+        if disk_cache is not None:
+            versions = disk_cache.fresh_versions(tables)
+            if versions is None:
+                conn = require_connection()
+                versions = fetch_table_versions(conn, tables)
+            rows = disk_cache.get(key, versions) if versions else None
+            if rows is not None:
+                yield rows
+                return
+        if _cache is not None or versions:
+            kept = []
+        conn = conn or require_connection()
+        cursor = execute_raw(conn, *query) if raw else execute(conn, *query)
+        rows = cursor.fetchmany(FETCH_CHUNK_ROWS)
+        try:
+            while rows:
+                if kept is not None:
+                    kept.extend(rows)
+                    if len(kept) > cache.MAX_CACHED_ROWS:
+                        kept = None
+                yield rows
+                rows = cursor.fetchmany(FETCH_CHUNK_ROWS)
+        finally:
+            # Drain a result the caller abandoned so the connection can run the next statement
+            try:
+                while rows:
+                    rows = cursor.fetchmany(FETCH_CHUNK_ROWS)
+                if raw:
+                    cursor.close()
+            except DB_ERRORS:
+                pass
     finally:
-        cursor.close()
-        conn.close()
+        if conn:
+            conn.close()
+    if kept is None:
+        return
+    if _cache is not None:
+        _cache.put(key, kept, tables, snapshot)
+    if versions:
+        disk_cache.put(key, versions, kept)
 
-def releaseTitle(sid):
+def print_result(result):
+    """
+    Prints a command's result the way the CLI always has: "Success", "Fail [message]", one
+    comma-joined line per row, or a header and a values line for Stats.
+    """
+    if isinstance(result, results.Rows):
+        try:
+            write_rows(result.chunks())
+        except Exception as e:
+            print("Fail", e)
+    elif isinstance(result, results.Failure):
+        if result.message is None:
+            print("Fail")
+        else:
+            print("Fail", result.message)
+    elif isinstance(result, results.Stats):
+        print(",".join(result.values))
+        print(",".join(str(value) for value in result.values.values()))
+    elif result is not None:
+        print("Success")
+
+def write_rows(chunks):
+    """
+    Prints rows as comma-joined lines, with one write per chunk of rows.
+    """
+    if RAW_OUTPUT:
+        write_raw_rows(chunks)
+        return
+    write = sys.stdout.write
+    for rows in chunks:
+        write("".join(",".join(map(str, row)) + "\n" for row in rows))
+
+def write_raw_rows(chunks):
+    """
+    Writes rows of raw bytes without decoding them; NULL is written as None, as str() does.
+    Goes straight to the binary stdout when there is one (the server captures text instead).
+    """
+    out = sys.stdout.buffer if isinstance(sys.stdout, io.TextIOWrapper) else None
+    if out:
+        sys.stdout.flush()  # Keep earlier text output ahead of these bytes
+    for rows in chunks:
+        data = b"".join(b",".join([b"None" if value is None else value for value in row]) + b"\n" for row in rows)
+        if out:
+            out.write(data)
+        else:
+            sys.stdout.write(data.decode("utf-8"))
+
+def bump_table_versions(conn, tables):
+    """
+    Bumps the table_versions counters of tables (all tables if None) in conn's open transaction,
+    so other processes' disk caches stop answering from results read before this write once it
+    commits, and not before. A failed bump raises like any other statement of the write.
+    """
+    if tables is None:
+        execute(conn, BUMP_ALL_VERSIONS_SQL)
+    else:
+        execute(conn, BUMP_VERSIONS_SQL, (",".join(tables),))
+
+def commit_write(conn, command):
+    """
+    Bumps the versions of the tables a write command changed, then commits them with the write.
+    """
+    bump_table_versions(conn, WRITE_TABLES[command])
+    conn.commit()
+
+def bump_all_versions():
+    """
+    Bumps every table_versions counter after an import, whose loads commit on many connections.
+    Returns True if successful; False otherwise.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return False
     try:
-        sql_code = (
-            "SELECT r.rid, r.title AS release_title, r.genre, v.title AS video_title, v.ep_num, v.length "
-            "FROM releases r "
-            "JOIN videos v ON r.rid = v.rid "
-            "JOIN sessions s ON v.rid = s.rid AND v.ep_num = s.ep_num "
-            "WHERE s.sid = %s "
-            "ORDER BY r.title ASC;"
-        )
-        cursor.execute(sql_code, (sid,))
-        rows = cursor.fetchall()
-        for row in rows:
-            print(",".join(str(x) for x in row))
-    except Exception as e:
-        print("Fail", e)
+        bump_table_versions(conn, None)
+        conn.commit()
+        return True
+    except DB_ERRORS as e:
+        sys.stderr.write(f"Error bumping table versions: {e}\n")
+        return False
     finally:
-        cursor.close()
         conn.close()
 
+def invalidate_cache(command):
+    """
+    Drops the cached results a command may have made stale from this process's caches (the
+    command bumped table_versions itself). Import and load-snapshot drop everything.
+    """
+    if command in ("import", "load-snapshot"):
+        tables = None
+    elif command in WRITE_TABLES:
+        tables = WRITE_TABLES[command]
+    else:
+        return
+    if _disk_cache is not None:
+        _disk_cache.forget_versions()
+    if _cache is None:
+        return
+    if tables is None:
+        _cache.clear()
+    else:
+        _cache.invalidate(tables)
+
+def read_result(command, args, raw=None):
+    """
+    Returns a read command's rows as a results.Rows stream. The query runs and its first chunk
+    is fetched here, so bad arguments, a missing connection or a failing query return a Failure;
+    the rest of the rows stream as the Rows is iterated.
+    """
+    try:
+        query = READ_QUERIES[command](*args)
+        chunks = read_row_chunks(command, args, query, raw)
+        first = next(chunks, None)
+    except Exception as e:
+        return results.Failure(str(e))
+    return results.Rows(results.READ_ROW_TYPES[command], chunks if first is None else chain([first], chunks))
+
+def listReleases(data):
+    uid = data
+    return read_result("listReleases", (uid,))
+
+def popularRelease(data):
+    # popular_release_query converts num, inside read_result's error handling
+    return read_result("popularRelease", (data[0],))
+
+def releaseTitle(sid):
+    return read_result("releaseTitle", (sid,))
 
 def activeViewer(N, start, end):
+    return read_result("activeViewer", (N, start, end))
+
+def videosViewed(rid):
+    return read_result("videosViewed", (rid,))
+
+def cacheStats(data):
+    stats = {}
+    if _cache is not None:
+        stats.update(_cache.stats())
+    if get_disk_cache() is not None:
+        stats.update((f"disk_{name}", value) for name, value in _disk_cache.stats().items())
+    if not stats:
+        return results.Failure("result cache is not enabled")
+    return results.Stats(stats)
+
+
+def normalize_genres():
+    """
+    Moves the genre lists an import loaded into users.genres into user_genres.
+    Returns True if successful; False otherwise.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return False
     try:
-        sql_code = (
-            "SELECT v.uid, v.first_name, v.last_name "
-            "FROM viewers v "
-            "JOIN sessions s ON v.uid = s.uid "
-            "WHERE s.initiate_at BETWEEN %s AND %s "
-            "GROUP BY v.uid "
-            "HAVING COUNT(s.sid) >= %s "
-            "ORDER BY v.uid ASC;"
-        )
-        cursor.execute(sql_code, (start, end, N))
-        rows = cursor.fetchall()
-        for row in rows:
-            print(",".join(str(x) for x in row))
+        execute(conn, SPLIT_GENRES_SQL)
+        execute(conn, CLEAR_GENRES_SQL)
+        conn.commit()
+        return True
     except Exception as e:
-        print("Fail", e)
+        sys.stderr.write(f"Error splitting genres: {e}\n")
+        return False
     finally:
-        cursor.close()
         conn.close()
 
-def videosViewed(rid):
+def rebuild_rollups(names=None):
+    """
+    Recomputes the named summary tables (all of them by default) in one transaction.
+    Returns True if successful; False otherwise.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    if not conn:
+        return False
     try:
-        sql_code = (
-            "SELECT v.rid, v.ep_num, v.title, v.length, "
-            "(SELECT COUNT(DISTINCT s.uid) FROM sessions s WHERE s.rid = v.rid) AS viewers "
-            "FROM videos v "
-            "WHERE v.rid = %s "
-            "ORDER BY v.rid DESC, v.ep_num ASC; "
-        )
-        cursor.execute(sql_code, (rid,))
-        rows = cursor.fetchall()
-
-        for row in rows:
-            print(",".join(str(x) for x in row))
-
+        execute(conn, SKIP_ROLLUPS_SQL)
+        for name in names or ROLLUP_REBUILDS:
+            for sql_code in ROLLUP_REBUILDS[name]:
+                execute(conn, sql_code)
+        rebuilt = list(names or ROLLUP_TABLES)
+        if "release_viewer_counts" in rebuilt:
+            rebuilt.append("release_viewers")  # Rewritten by the same rebuild
+        bump_table_versions(conn, rebuilt)
+        conn.commit()
+        return True
     except Exception as e:
-        print("Fail", e)
+        sys.stderr.write(f"Error rebuilding rollups: {e}\n")
+        return False
     finally:
-        cursor.close()
+        try:
+            execute(conn, RESUME_ROLLUPS_SQL)  # Pooled sessions keep user variables
+        except Exception:
+            pass
         conn.close()
 
+def rebuild_upserted_rollups(tables):
+    """
+    Rebuilds the UPSERT_ROLLUPS of the tables an incremental import changed, if any.
+    Returns True if successful; False otherwise.
+    """
+    names = [name for table in tables for name in UPSERT_ROLLUPS.get(table, [])]
+    return not names or rebuild_rollups(names)
 
-if __name__ == '__main__':
-    # Expect: python3 project.py import test_data
-    if len(sys.argv) < 2:
-        sys.stdout.write("Fail")
-        sys.exit(1)
+def rebuildRollups(data):
+    names = data[:1]
+    if names and names[0] not in ROLLUP_REBUILDS:
+        return results.Failure(f"unknown rollup {names[0]}")
+    return results.SUCCESS if rebuild_rollups(names) else results.Failure()
 
-    command = sys.argv[1]
+def manage_partitions(ahead, archive_before=None, archive_dir=partitions.DEFAULT_ARCHIVE_DIR):
+    """
+    Creates monthly sessions partitions through ahead months from now, then archives and drops
+    the partitions older than archive_before ("YYYY-MM"), if given.
+    Returns True if successful; False otherwise.
+    """
+    conn = get_connection()
+    if not conn:
+        return False
+    cursor = conn.cursor()
+    archived = []
+    try:
+        if not partitions.list_partitions(cursor):
+            sys.stderr.write("sessions is not partitioned; import with --partition-sessions\n")
+            return False
+        for name in partitions.add_future_partitions(cursor, ahead):
+            sys.stderr.write(f"created partition {name}\n")
+        if archive_before:
+            archived = partitions.archive_partitions(cursor, archive_before, archive_dir)
+            for file_path in archived:
+                sys.stderr.write(f"archived {file_path}\n")
+        bump_table_versions(conn, (partitions.PARTITIONED_TABLE,))
+        conn.commit()
+    except DB_ERRORS + (OSError, ValueError) as e:
+        sys.stderr.write(f"Error managing partitions: {e}\n")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+    # rebuild_rollups borrows its own connection, so ours goes back to the pool first
+    if archived:
+        return rebuild_rollups(["release_viewer_counts"])
+    return True
 
-    if command == "import":
-        if len(sys.argv) < 3:
-            sys.stdout.write("Fail")
-            sys.exit(1)
-        folder_name = sys.argv[2]
-        success = reset_database() and import_csv_with_insert(folder_name) and verify_data()
-        if success:
-            sys.stdout.write("Success")
-            sys.exit(0)
-        else:
-            sys.stdout.write("Fail")
-            sys.exit(1)
+def command_result(argv):
+    """
+    Runs one data command (a read or write, given as CLI arguments) without printing.
+    Returns its result (see results.py), or None if the command is unknown.
+    """
+    command = argv[0]
 
     if command == "insertViewer":
-        insertViewer(sys.argv[2:])
+        return insertViewer(argv[1:])
 
     elif command == "addGenre":
-        addGenre(sys.argv[2:])
-            
+        return addGenre(argv[1:])
+
     elif command == "deleteViewer":
-        deleteViewer(sys.argv[2])
+        return deleteViewer(argv[1])
 
     elif command == "insertMovie":
-        insertMovie(sys.argv[2:])
+        return insertMovie(argv[1:])
 
     elif command == "insertSession":
-        insertSession(sys.argv[2:])
+        return insertSession(argv[1:])
 
     elif command == "updateRelease":
-        updateRelease(sys.argv[2:])
+        return updateRelease(argv[1:])
 
     elif command == "listReleases":
-         listReleases(sys.argv[2])
+        return listReleases(argv[1])
 
     elif command == "popularRelease":
-        popularRelease(sys.argv[2:])
+        return popularRelease(argv[1:])
 
     elif command == "releaseTitle":
-        releaseTitle(sys.argv[2])
+        return releaseTitle(argv[1])
 
     elif command == "activeViewer":
-        activeViewer(sys.argv[2], sys.argv[3], sys.argv[4])
+        return activeViewer(argv[1], argv[2], argv[3])
 
     elif command == "videosViewed":
-        videosViewed(sys.argv[2])
\ No newline at end of file
+        return videosViewed(argv[1])
+
+    elif command == "rebuildRollups":
+        # Expect: python3 project.py rebuildRollups [release_review_counts | release_viewer_counts | viewer_daily_sessions]
+        return rebuildRollups(argv[1:])
+
+    elif command == "cacheStats":
+        # Expect: python3 client.py cacheStats  (serve or batch mode)
+        return cacheStats(argv[1:])
+
+    return None
+
+def run_command(argv):
+    """
+    Runs one command, given the arguments after the script name, and prints its output.
+    Returns the exit status. Used by __main__ and by the server.
+    """
+    if len(argv) < 1:
+        sys.stdout.write("Fail")
+        return 1
+
+    command = argv[0]
+
+    if command == "import":
+        # Expect: python3 project.py import test_data [--method=load|insert] [--batch-size=N]
+        #                                               [--commit-every=N] [--workers=N]
+        #                                               [--chunk-workers=N] [--chunk-size=BYTES] [--chunk-retries=N]
+        #                                               [--defer-indexes | --incremental]
+        #                                               [--partition-sessions[=YYYY-MM]]
+        args, options = parse_options(argv[1:])
+        settings = import_settings(options)
+        if len(args) < 1 or settings is None:
+            sys.stdout.write("Fail")
+            return 1
+        folder_name = args[0]
+        if BACKEND == "sqlite":
+            load = import_csv_with_sqlite
+        elif options.get("method") == "insert":
+            load = import_csv_with_insert
+        else:
+            load = import_csv_with_load_data
+        # An incremental import keeps the existing tables and upserts only new or changed rows;
+        # its triggers keep most rollups current and the UPSERT_ROLLUPS of the tables it changed are
+        # rebuilt, while a full import rebuilds every rollup once at the end
+        changed = set()
+        if settings["incremental"]:
+            settings["changed_tables"] = changed
+        success = ((settings["incremental"]
+                    or reset_database(settings["defer_indexes"], options.get("partition_sessions", False)))
+                   and load(folder_name, **settings)
+                   and normalize_genres()
+                   and (rebuild_upserted_rollups(changed) if settings["incremental"] else rebuild_rollups())
+                   and verify_data())
+        success = bump_all_versions() and success  # Even a failed import may have changed tables
+        invalidate_cache(command)
+        if success:
+            sys.stdout.write("Success")
+            return 0
+        else:
+            sys.stdout.write("Fail")
+            return 1
+
+    if command == "export-snapshot":
+        # Expect: python3 project.py export-snapshot test_data <snapshot dir>
+        args, _ = parse_options(argv[1:])
+        if len(args) < 2:
+            sys.stdout.write("Fail")
+            return 1
+        try:
+            snapshot.export_snapshot(args[0], args[1])
+        except (OSError, ValueError, csv.Error) as e:
+            sys.stdout.write("Fail")
+            sys.stderr.write(f"Error exporting snapshot: {e}\n")
+            return 1
+        sys.stdout.write("Success")
+        return 0
+
+    if command == "load-snapshot":
+        # Expect: python3 project.py load-snapshot <snapshot dir> [--batch-size=N] [--commit-every=N]
+        # Same result as importing the CSVs the snapshot was exported from
+        args, options = parse_options(argv[1:])
+        settings = import_settings(options)
+        if len(args) < 1 or settings is None:
+            sys.stdout.write("Fail")
+            return 1
+        try:
+            tables = snapshot.load_snapshot(args[0])  # Rejects a stale snapshot before the reset
+        except (OSError, ValueError) as e:
+            sys.stdout.write("Fail")
+            sys.stderr.write(f"Cannot read snapshot: {e}\n")
+            return 1
+        success = (reset_database()
+                   and import_snapshot(tables, settings["batch_size"], settings["commit_every"])
+                   and normalize_genres()
+                   and rebuild_rollups()
+                   and verify_data())
+        success = bump_all_versions() and success
+        invalidate_cache(command)
+        if success:
+            sys.stdout.write("Success")
+            return 0
+        sys.stdout.write("Fail")
+        return 1
+
+    if command == "serve":
+        # Expect: python3 project.py serve [--socket=PATH | --port=N] [--pool-size=N]
+        #                                  [--cache-size=N] [--cache-bytes=N] [--cache-ttl=SECONDS]
+        # then run commands with: python3 client.py <command> [args...]
+        _, options = parse_options(argv[1:])
+        try:
+            port = int(options.get("port", server.DEFAULT_PORT))
+            pool_size = int(options.get("pool_size", server.DEFAULT_POOL_SIZE))
+        except ValueError:
+            port = pool_size = 0
+        # Every serve option takes a value, so a bare --port or --socket is an error too
+        if not configure_cache(options) or True in options.values() or not 0 < port < 65536 or pool_size < 1:
+            sys.stdout.write("Fail")
+            return 1
+        if options.get("socket"):
+            address = options["socket"]
+        elif options.get("port"):
+            address = ("127.0.0.1", port)
+        else:
+            address = server.default_address()
+        if BACKEND == "mysql":
+            configure_pool(pool_size)
+            try:
+                get_pool()  # Open every pooled connection before the first request
+            except DB_ERRORS as e:
+                sys.stdout.write("Fail")
+                sys.stderr.write(f"Cannot open connection pool: {e}\n")
+                return 1
+        server.serve(run_command, address)
+        return 0
+
+    if command == "partitions":
+        # Expect: python3 project.py partitions [--ahead=N] [--archive-before=YYYY-MM] [--archive-dir=DIR]
+        _, options = parse_options(argv[1:])
+        try:
+            ahead = int(options.get("ahead", partitions.DEFAULT_AHEAD_MONTHS))
+        except ValueError:
+            ahead = -1
+        if ahead < 0 or options.get("archive_before") is True or BACKEND != "mysql":
+            sys.stdout.write("Fail")
+            return 1
+        success = manage_partitions(ahead, options.get("archive_before"),
+                                    options.get("archive_dir", partitions.DEFAULT_ARCHIVE_DIR))
+        invalidate_cache(command)
+        if success:
+            sys.stdout.write("Success")
+            return 0
+        sys.stdout.write("Fail")
+        return 1
+
+    if command == "batch":
+        # Expect: python3 project.py batch [commands.txt | -] [--commit-every=N]
+        #                                  [--cache-size=N] [--cache-bytes=N] [--cache-ttl=SECONDS]
+        args, options = parse_options(argv[1:])
+        if not configure_cache(options):
+            sys.stdout.write("Fail")
+            return 1
+        try:
+            commit_every = int(options.get("commit_every", BATCH_COMMIT_EVERY))
+        except ValueError:
+            commit_every = 0
+        if commit_every < 1:
+            sys.stdout.write("Fail")
+            return 1
+        if not args or args[0] == "-":
+            return run_batch(sys.stdin, commit_every)
+        try:
+            with open(args[0], newline='', encoding='utf-8') as command_file:
+                return run_batch(command_file, commit_every)
+        except OSError:
+            sys.stdout.write("Fail")
+            return 1
+
+    result = command_result(argv)
+    if result is None:
+        sys.stdout.write("Fail")  # Unknown command, as the server answers
+        return 1
+    print_result(result)
+    invalidate_cache(command)
+    return 0
+
+
+if __name__ == '__main__':
+    # Expect: python3 project.py import test_data
+    sys.exit(run_command(sys.argv[1:]))
@@ -0,0 +1,95 @@
+from collections import namedtuple
+
+# Typed results of the command functions in project.py. In-process callers (async_api.py, or any
+# code importing project) use them directly; the CLI, batch and serve print them with
+# project.print_result(), which produces the same text the commands always printed.
+
+# One row type per read command, with the column names of its SQL
+ListedRelease = namedtuple("ListedRelease", ["rid", "genre", "title"])
+PopularRelease = namedtuple("PopularRelease", ["rid", "title", "reviewCount"])
+ReleaseTitle = namedtuple("ReleaseTitle", ["rid", "release_title", "genre", "video_title", "ep_num", "length"])
+ActiveViewer = namedtuple("ActiveViewer", ["uid", "first_name", "last_name"])
+VideoViewed = namedtuple("VideoViewed", ["rid", "ep_num", "title", "length", "viewers"])
+
+READ_ROW_TYPES = {
+    "listReleases": ListedRelease,
+    "popularRelease": PopularRelease,
+    "releaseTitle": ReleaseTitle,
+    "activeViewer": ActiveViewer,
+    "videosViewed": VideoViewed,
+}
+
+
+class Success:
+    """
+    A write command that succeeded. Printed as "Success".
+    """
+    __slots__ = ()
+    ok = True
+
+    def __repr__(self):
+        return "Success()"
+
+
+SUCCESS = Success()
+
+
+class Failure:
+    """
+    A command that failed, with the error message when there is one. Printed as "Fail [message]".
+    """
+    __slots__ = ("message",)
+    ok = False
+
+    def __init__(self, message=None):
+        self.message = message
+
+    def __repr__(self):
+        return f"Failure({self.message!r})"
+
+
+class Stats:
+    """
+    Named counters, e.g. from cacheStats. Printed as a header line and a values line.
+    """
+    __slots__ = ("values",)
+    ok = True
+
+    def __init__(self, values):
+        self.values = values
+
+    def __repr__(self):
+        return f"Stats({self.values!r})"
+
+
+class Rows:
+    """
+    A read command's rows, streamed from the database while they are iterated (once).
+    Iterating yields row_type tuples; chunks() yields the plain tuples in fetch-sized lists,
+    which is what the CLI prints from. The query has already run (a failing one is a Failure
+    instead); an error fetching a later chunk surfaces while iterating.
+    """
+    __slots__ = ("row_type", "source")
+    ok = True
+
+    def __init__(self, row_type, chunks):
+        self.row_type = row_type
+        self.source = chunks
+
+    def chunks(self):
+        return self.source
+
+    def __iter__(self):
+        make = self.row_type._make
+        for rows in self.source:
+            for row in rows:
+                yield make(row)
+
+    def all(self):
+        """
+        Reads the rest of the rows into a list.
+        """
+        return list(self)
+
+    def __repr__(self):
+        return f"Rows({self.row_type.__name__})"
@@ -11,7 +11,7 @@ CREATE TABLE users (
     city VARCHAR(100),
     state VARCHAR(50),
     zip VARCHAR(20),
-    genres TEXT  -- Ensure CSV header uses 'genre_list' NOT 'genres'
+    genres TEXT  -- Staging for the CSV's ';'-joined list: import moves it into user_genres and clears it
     
 );
 
@@ -60,6 +60,8 @@ CREATE TABLE videos (
     FOREIGN KEY (rid) REFERENCES releases(rid) ON DELETE CASCADE
 );
 
+-- `import --partition-sessions[=YYYY-MM]` partitions this table by month on initiate_at
+-- (see partitions.py): its foreign keys are dropped and the primary key becomes (sid, initiate_at)
 CREATE TABLE sessions (
 	sid INTEGER PRIMARY KEY AUTO_INCREMENT,
     uid INTEGER NOT NULL,
@@ -83,3 +85,121 @@ CREATE TABLE reviews (
     FOREIGN KEY (uid) REFERENCES viewers(uid) ON DELETE CASCADE,
     FOREIGN KEY (rid) REFERENCES releases(rid) ON DELETE CASCADE
 );
+
+-- Indexes for the read commands; explain_check.py verifies the plans use them
+CREATE INDEX idx_sessions_initiate_uid ON sessions (initiate_at, uid); -- activeViewer: date range, grouped by uid
+CREATE INDEX idx_sessions_rid_uid ON sessions (rid, uid);             -- rebuildRollups: distinct viewers per release
+CREATE INDEX idx_sessions_uid_initiate ON sessions (uid, initiate_at); -- deleteViewer, also without the uid foreign key
+CREATE INDEX idx_reviews_uid_rid ON reviews (uid, rid);               -- listReleases: releases a viewer reviewed
+CREATE INDEX idx_reviews_rid_rvid ON reviews (rid, rvid);             -- rebuildRollups: reviews per release
+
+-- One row per genre a user follows; seq keeps the order of the old ';'-joined list
+CREATE TABLE user_genres (
+	uid INTEGER,
+    seq INTEGER,
+    genre VARCHAR(50) NOT NULL,
+    PRIMARY KEY (uid, seq),
+    UNIQUE KEY uq_user_genres_lower (uid, (LOWER(genre))), -- addGenre's duplicate check
+    INDEX idx_user_genres_genre (genre, uid),              -- users interested in a genre
+    FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE
+);
+
+-- The genre lists in the old users.genres format, for readers of that column
+CREATE VIEW user_genre_lists AS
+    SELECT u.uid, GROUP_CONCAT(g.genre ORDER BY g.seq SEPARATOR ';') AS genres
+    FROM users u
+    LEFT JOIN user_genres g ON g.uid = u.uid
+    GROUP BY u.uid;
+
+-- Review count per release, so popularRelease reads the top N rows of one index.
+-- Kept current by the triggers below; `project.py rebuildRollups` recomputes it.
+CREATE TABLE release_review_counts (
+	rid INTEGER PRIMARY KEY,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    INDEX idx_review_counts_top (review_count DESC, rid DESC),
+    FOREIGN KEY (rid) REFERENCES releases(rid) ON DELETE CASCADE
+);
+
+-- Triggers skip the rollups while @cs122a_skip_rollups is set (full imports rebuild them afterwards).
+-- They do not fire for foreign key cascades, so deleteViewer adjusts the counts itself.
+CREATE TRIGGER releases_review_count_insert AFTER INSERT ON releases FOR EACH ROW
+    INSERT IGNORE INTO release_review_counts (rid, review_count)
+    SELECT NEW.rid, 0 FROM DUAL WHERE @cs122a_skip_rollups IS NULL;
+
+CREATE TRIGGER reviews_review_count_insert AFTER INSERT ON reviews FOR EACH ROW
+    INSERT INTO release_review_counts (rid, review_count)
+    SELECT NEW.rid, 1 FROM DUAL WHERE @cs122a_skip_rollups IS NULL
+    ON DUPLICATE KEY UPDATE review_count = review_count + 1;
+
+CREATE TRIGGER reviews_review_count_delete AFTER DELETE ON reviews FOR EACH ROW
+    UPDATE release_review_counts SET review_count = review_count - 1
+    WHERE rid = OLD.rid AND @cs122a_skip_rollups IS NULL;
+
+CREATE TRIGGER reviews_review_count_update AFTER UPDATE ON reviews FOR EACH ROW
+    UPDATE release_review_counts SET review_count = review_count + (rid = NEW.rid) - (rid = OLD.rid)
+    WHERE rid IN (OLD.rid, NEW.rid) AND @cs122a_skip_rollups IS NULL;
+
+-- Distinct viewers per release for videosViewed: the (rid, uid) set and its size per release.
+-- A session insert adds to the set; only a new pair bumps the count.
+CREATE TABLE release_viewers (
+	rid INTEGER,
+    uid INTEGER,
+    PRIMARY KEY (rid, uid),
+    FOREIGN KEY (rid) REFERENCES releases(rid) ON DELETE CASCADE,
+    FOREIGN KEY (uid) REFERENCES viewers(uid) ON DELETE CASCADE
+);
+
+CREATE TABLE release_viewer_counts (
+	rid INTEGER PRIMARY KEY,
+    viewer_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (rid) REFERENCES releases(rid) ON DELETE CASCADE
+);
+
+CREATE TRIGGER sessions_release_viewer_insert AFTER INSERT ON sessions FOR EACH ROW
+    INSERT IGNORE INTO release_viewers (rid, uid)
+    SELECT NEW.rid, NEW.uid FROM DUAL WHERE @cs122a_skip_rollups IS NULL;
+
+CREATE TRIGGER release_viewers_count_insert AFTER INSERT ON release_viewers FOR EACH ROW
+    INSERT INTO release_viewer_counts (rid, viewer_count)
+    SELECT NEW.rid, 1 FROM DUAL WHERE @cs122a_skip_rollups IS NULL
+    ON DUPLICATE KEY UPDATE viewer_count = viewer_count + 1;
+
+-- Sessions started per viewer per day, so activeViewer sums whole days instead of scanning sessions
+CREATE TABLE viewer_daily_sessions (
+	day DATE,
+    uid INTEGER,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, uid),
+    FOREIGN KEY (uid) REFERENCES viewers(uid) ON DELETE CASCADE
+);
+
+CREATE TRIGGER sessions_daily_count_insert AFTER INSERT ON sessions FOR EACH ROW
+    INSERT INTO viewer_daily_sessions (day, uid, session_count)
+    SELECT DATE(NEW.initiate_at), NEW.uid, 1 FROM DUAL WHERE @cs122a_skip_rollups IS NULL
+    ON DUPLICATE KEY UPDATE session_count = session_count + 1;
+
+-- Version counter per table for the persistent read cache (CS122A_CACHE_FILE, see cache.py).
+-- Write commands bump the tables they change; seeding with UUID_SHORT() means a recreated
+-- database never repeats versions an old cache file was tagged with.
+CREATE TABLE table_versions (
+	table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL
+);
+
+INSERT INTO table_versions (table_name, version) VALUES
+    ('users', UUID_SHORT()), ('producers', UUID_SHORT()), ('viewers', UUID_SHORT()),
+    ('releases', UUID_SHORT()), ('movies', UUID_SHORT()), ('series', UUID_SHORT()),
+    ('videos', UUID_SHORT()), ('sessions', UUID_SHORT()), ('reviews', UUID_SHORT()),
+    ('user_genres', UUID_SHORT()), ('release_review_counts', UUID_SHORT()),
+    ('release_viewers', UUID_SHORT()), ('release_viewer_counts', UUID_SHORT()),
+    ('viewer_daily_sessions', UUID_SHORT());
+
+-- Per-file watermarks for `import --incremental`
+CREATE TABLE import_state (
+	table_name VARCHAR(64) PRIMARY KEY,
+    file_size BIGINT NOT NULL,       -- Byte offset loaded up to
+    head_checksum CHAR(64) NOT NULL, -- sha256 of the first block of the file
+    tail_checksum CHAR(64) NOT NULL, -- sha256 of the block ending at file_size
+    row_count BIGINT NOT NULL,
+    loaded_at DATETIME NOT NULL
+);
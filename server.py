@@ -0,0 +1,195 @@
+import os
+import sys
+import io
+import csv
+import signal
+import socket
+import socketserver
+import threading
+
+# Where `serve` listens and client.py connects: a Unix socket if CS122A_SOCKET is set,
+# otherwise localhost TCP on CS122A_PORT
+DEFAULT_PORT = 6122
+DEFAULT_POOL_SIZE = 8
+
+# The only commands the server runs. Clients are not authenticated, so commands that reset the
+# database or read and write arbitrary paths (import, load-snapshot, export-snapshot, partitions)
+# stay on the command line, as do serve and batch (batch would read the server's stdin).
+SERVED_COMMANDS = {
+    "insertViewer", "addGenre", "deleteViewer", "insertMovie", "insertSession", "updateRelease",
+    "listReleases", "popularRelease", "releaseTitle", "activeViewer", "videosViewed",
+    "rebuildRollups", "cacheStats",
+}
+
+
+def default_address():
+    """
+    Returns the socket path or (host, port) from the CS122A_SOCKET / CS122A_PORT environment variables.
+    """
+    if os.getenv("CS122A_SOCKET"):
+        return os.getenv("CS122A_SOCKET")
+    return ("127.0.0.1", int(os.getenv("CS122A_PORT", DEFAULT_PORT)))
+
+
+def encode_command(argv):
+    """
+    Encodes a command and its arguments as one CSV line, so arguments may contain commas or spaces.
+    """
+    line = io.StringIO()
+    csv.writer(line, lineterminator="\n").writerow(argv)
+    return line.getvalue().encode("utf-8")
+
+
+def decode_command(line):
+    """
+    Decodes a CSV command line back into an argv list.
+    """
+    return next(csv.reader([line.decode("utf-8").rstrip("\r\n")]), [])
+
+
+def encode_response(status, output):
+    """
+    Frames a command result as "<exit status> <byte length>\n" followed by the output bytes.
+    """
+    data = output.encode("utf-8")
+    return f"{status} {len(data)}\n".encode("ascii") + data
+
+
+class ThreadOutput:
+    """
+    Stands in for sys.stdout so each server thread collects its own command's output.
+    Threads that are not capturing write to the real stdout.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self, buffer):
+        self.local.buffer = buffer
+
+    def release(self):
+        self.local.buffer = None
+
+    def write(self, text):
+        return (getattr(self.local, "buffer", None) or self.stream).write(text)
+
+    def flush(self):
+        (getattr(self.local, "buffer", None) or self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def execute(run_command, argv):
+    """
+    Runs one command with its stdout captured. Returns (exit status, output text).
+    """
+    buffer = io.StringIO()
+    sys.stdout.capture(buffer)
+    try:
+        if not argv or argv[0] not in SERVED_COMMANDS:
+            sys.stdout.write("Fail")
+            status = 1
+        else:
+            status = run_command(argv)
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        print("Fail", e)
+        status = 1
+    finally:
+        sys.stdout.release()
+    return status, buffer.getvalue()
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    """
+    Answers newline-delimited commands on one client connection until it closes.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            status, output = execute(self.server.run_command, decode_command(line))
+            self.wfile.write(encode_response(status, output))
+            self.wfile.flush()
+
+
+class TCPCommandServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class UnixCommandServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def bind(run_command, address):
+    """
+    Creates the listening server for a Unix socket path or a (host, port) pair.
+    """
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.unlink(address)
+        # Created 0600, so no other user's process can connect, even before a chmod could run
+        umask = os.umask(0o177)
+        try:
+            server = UnixCommandServer(address, CommandHandler)
+        finally:
+            os.umask(umask)
+    else:
+        server = TCPCommandServer(address, CommandHandler)
+    server.run_command = run_command
+    return server
+
+
+def serve(run_command, address=None):
+    """
+    Serves run_command(argv) on a Unix socket path or a (host, port) pair until interrupted.
+    Each client connection gets its own thread; command output is returned instead of printed.
+    """
+    address = address or default_address()
+    server = bind(run_command, address)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    sys.stdout = ThreadOutput(sys.stdout)
+    sys.stderr.write(f"Serving on {address}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sys.stdout = sys.stdout.stream
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+
+
+def connect(address=None):
+    """
+    Opens a client socket to a running server.
+    """
+    address = address or default_address()
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.connect(address)
+    return sock
+
+
+def send_command(sock_file, argv):
+    """
+    Sends one command over a connected socket file and returns (exit status, output text).
+    """
+    sock_file.write(encode_command(argv))
+    sock_file.flush()
+    status, length = sock_file.readline().split()
+    return int(status), sock_file.read(int(length)).decode("utf-8")
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+
+import columnar
+import loader
+
+# Binary columnar snapshots of the import tables, so repeated rebuilds skip parsing the CSVs.
+# A snapshot is a directory with one <table>.snap file per table:
+#   MAGIC, header length (uint32 little-endian), JSON header, then each column's buffers at
+#   8-byte aligned offsets: the int64 / int16 arrays of columnar.py in native byte order, and an
+#   int64 offsets array plus a UTF-8 heap for text.
+# Reading memory-maps the file and wraps the buffers in memoryviews, so nothing is copied until
+# a value is used. The header records a hash of the table's column layout in schema.sql; a file
+# written under another layout is rejected rather than misread.
+# Expect: python3 project.py export-snapshot test_data snapshot
+#         python3 project.py load-snapshot snapshot   (into the database, like import)
+#         python3 columnar.py snapshot popularRelease 5   (in-process, no database)
+
+MAGIC = b"CS122ASN"
+FORMAT_VERSION = 1
+SUFFIX = ".snap"
+ALIGNMENT = 8
+HEADER_LENGTH = struct.Struct("<I")
+
+
+def schema_hash(table, schema_path=loader.SCHEMA_PATH):
+    """
+    Hashes the snapshot format version and the table's columns, kinds and ENUM labels.
+    """
+    layout = [FORMAT_VERSION, table, columnar.schema_columns(schema_path)[table]]
+    return hashlib.sha256(json.dumps(layout).encode("utf-8")).hexdigest()
+
+
+def aligned(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def column_buffers(column):
+    """
+    Returns the buffers one column is stored as.
+    """
+    if isinstance(column, columnar.StringColumn):
+        return [column.offsets, column.heap]
+    return [column]
+
+
+def write_table(table, file_path, schema_path=loader.SCHEMA_PATH):
+    """
+    Writes a columnar.Table to file_path, replacing any existing file only once it is complete.
+    """
+    buffers, layout = [], []
+    position = end = 0
+    for name in table.kinds:
+        for buffer in column_buffers(table[name]):
+            nbytes = memoryview(buffer).nbytes
+            buffers.append((position, buffer))
+            layout.append([name, position, nbytes])
+            end = position + nbytes
+            position = aligned(end)
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "table": table.name,
+        "schema_hash": schema_hash(table.name, schema_path),
+        "byteorder": sys.byteorder,
+        "rows": len(table),
+        "buffers": layout,
+    }).encode("utf-8")
+    data_start = aligned(len(MAGIC) + HEADER_LENGTH.size + len(header))
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        for offset, buffer in buffers:
+            f.seek(data_start + offset)
+            f.write(buffer)
+        f.truncate(data_start + end)  # No padding after the last buffer, so any cut shows
+    os.replace(temp_path, file_path)
+
+
+def read_table(file_path, table, schema_path=loader.SCHEMA_PATH):
+    """
+    Memory-maps one snapshot file as a columnar.Table whose columns are views of the mapping.
+    Raises ValueError if the file is not a snapshot of table under the current schema, or is
+    truncated or corrupt.
+    """
+    with open(file_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # ValueError if the file is empty
+    view = memoryview(mm)
+    prefix = len(MAGIC) + HEADER_LENGTH.size
+    if len(view) < prefix or bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{file_path} is not a snapshot file")
+    (length,) = HEADER_LENGTH.unpack_from(view, len(MAGIC))
+    if prefix + length > len(view):
+        raise ValueError(f"{file_path} is truncated")
+    header = json.loads(bytes(view[prefix:prefix + length]))
+    if header.get("table") != table or header.get("schema_hash") != schema_hash(table, schema_path):
+        raise ValueError(f"{file_path} was exported under a different schema.sql; export it again")
+    if header.get("byteorder") != sys.byteorder:
+        raise ValueError(f"{file_path} was exported on a {header.get('byteorder')}-endian machine")
+    data_start = aligned(prefix + length)
+    buffers = {}
+    try:
+        rows = int(header["rows"])
+        for name, offset, nbytes in header["buffers"]:
+            start = data_start + offset
+            if offset < 0 or nbytes < 0 or start + nbytes > len(view):
+                raise ValueError(f"{file_path} is truncated")
+            buffers.setdefault(name, []).append(view[start:start + nbytes])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{file_path} has a corrupt header: {e}") from None
+    columns, kinds = {}, {}
+    for name, kind, labels in columnar.schema_columns(schema_path)[table]:
+        parts = buffers.get(name, [])
+        if len(parts) != (2 if kind == "str" else 1):
+            raise ValueError(f"{file_path} has no data for column {name}")
+        # Offsets (rows + 1 of them) into the heap for text, one value per row otherwise
+        values = parts[0]
+        itemsize = 2 if kind == "enum" else 8
+        if values.nbytes != (rows + (kind == "str")) * itemsize:
+            raise ValueError(f"{file_path} is corrupt: column {name} does not have {rows} rows")
+        values = values.cast("h" if kind == "enum" else "q")
+        if kind == "str":
+            if values[0] != 0 or values[rows] != parts[1].nbytes:
+                raise ValueError(f"{file_path} is corrupt: column {name} does not match its text")
+            columns[name] = columnar.StringColumn(values, parts[1])
+        else:
+            columns[name] = values
+        kinds[name] = (kind, labels)
+    return columnar.Table(table, columns, kinds)
+
+
+def export_snapshot(folder, directory, tables=loader.TABLES, schema_path=loader.SCHEMA_PATH):
+    """
+    Converts <folder>/<table>.csv into <directory>/<table>.snap for each table with a CSV.
+    Returns {table: rows written}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    for table in tables:
+        file_path = os.path.join(folder, f"{table}.csv")
+        if not os.path.exists(file_path):
+            continue
+        loaded = columnar.load_table(file_path, table, schema_path)
+        write_table(loaded, os.path.join(directory, table + SUFFIX), schema_path)
+        written[table] = len(loaded)
+    return written
+
+
+def load_snapshot(directory, tables=loader.TABLES, schema_path=loader.SCHEMA_PATH):
+    """
+    Memory-maps <directory>/<table>.snap for each table that has one. Returns {table: columnar.Table}.
+    Raises ValueError if there are none, or any is stale.
+    """
+    loaded = {}
+    for table in tables:
+        file_path = os.path.join(directory, table + SUFFIX)
+        if os.path.exists(file_path):
+            loaded[table] = read_table(file_path, table, schema_path)
+    if not loaded:
+        raise ValueError(f"no {SUFFIX} files in {directory}")
+    return loaded
+
+
+def is_snapshot(path):
+    """
+    Tells a snapshot directory from a CSV folder.
+    """
+    return os.path.isdir(path) and any(name.endswith(SUFFIX) for name in os.listdir(path))
+
+
+def text_rows(table):
+    """
+    Yields each row as the text its import CSV had (empty for NULL), for loader.insert_batches().
+    """
+    names = list(table.kinds)
+    for i in range(len(table)):
+        yield ["" if value is None else str(value) for value in (table.value(name, i) for name in names)]
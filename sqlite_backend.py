@@ -0,0 +1,244 @@
+import os
+import re
+import csv
+import sys
+import sqlite3
+import threading
+from functools import lru_cache
+
+import columnar
+import loader
+
+# Embedded SQLite storage for the same commands, selected with CS122A_BACKEND=sqlite.
+# schema.sql is translated to SQLite's dialect on reset; command SQL is translated as it runs,
+# except for the few statements project.py overrides in SQLITE_SQL.
+DEFAULT_PATH = "cs122a.db"
+INSERT_BATCH_ROWS = 5000
+
+_local = threading.local()
+
+# Collation given to text columns so comparisons, ORDER BY, GROUP BY and unique keys treat case and
+# accents like MySQL's default utf8mb4_0900_ai_ci. It is registered on every connection connect()
+# opens; other SQLite clients must register it too before comparing those columns.
+COLLATION = "ai_ci"
+collation_key = lru_cache(maxsize=65536)(columnar.collation_key)
+
+
+def compare_text(a, b):
+    a, b = collation_key(a), collation_key(b)
+    return (a > b) - (a < b)
+
+# Views whose MySQL definition SQLite cannot run as written. Before SQLite 3.44 aggregates take
+# no ORDER BY, so the genres are concatenated from a subquery already ordered by (uid, seq).
+SQLITE_VIEWS = {
+    "user_genre_lists": (
+        "CREATE VIEW user_genre_lists AS "
+        "SELECT u.uid, l.genres "
+        "FROM users u "
+        "LEFT JOIN (SELECT uid, GROUP_CONCAT(genre, ';') AS genres "
+        "FROM (SELECT uid, genre FROM user_genres ORDER BY uid, seq) GROUP BY uid) l ON l.uid = u.uid"
+    ),
+}
+
+
+def translate_column(item):
+    """
+    Rewrites one MySQL column definition for SQLite: ENUM becomes a CHECKed TEXT column,
+    DECIMAL and dates are stored as text (so values print exactly as loaded), text columns
+    get the COLLATION and AUTO_INCREMENT is dropped (an INTEGER PRIMARY KEY already assigns ids).
+    """
+    name, column_type = item.split()[:2]
+    if re.match(r"(VAR)?CHAR\b|(TINY|MEDIUM|LONG)?TEXT\b", column_type, re.IGNORECASE):
+        item += f" COLLATE {COLLATION}"
+    item = re.sub(r"\s+AUTO_INCREMENT\b", "", item, flags=re.IGNORECASE)
+    item = re.sub(r"\bENUM\s*\((.*?)\)", lambda m: f"TEXT CHECK ({name} IN ({m.group(1)}))", item,
+                  flags=re.IGNORECASE)
+    item = re.sub(r"\bDECIMAL\s*\([^)]*\)|\bDATETIME\b|\bDATE\b", "TEXT", item, flags=re.IGNORECASE)
+    return re.sub(r"\bBIGINT\s+UNSIGNED\b|\bBIGINT\b", "INTEGER", item, flags=re.IGNORECASE)
+
+
+def translate_body(statement):
+    """
+    Rewrites MySQL-only syntax inside INSERT/UPDATE/SELECT text. The rollup triggers' session
+    flag has no SQLite equivalent, so they always run (a full import rebuilds the rollups anyway).
+    """
+    statement = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", statement, flags=re.IGNORECASE)
+    statement = re.sub(r"\s+FROM\s+DUAL\b", "", statement, flags=re.IGNORECASE)
+    statement = re.sub(r"@\w+\s+IS\s+NULL", "1", statement)
+    statement = re.sub(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", "ON CONFLICT DO UPDATE SET", statement,
+                       flags=re.IGNORECASE)
+    return re.sub(r"\bUUID_SHORT\(\)", "(abs(random()) % 9007199254740992)", statement, flags=re.IGNORECASE)
+
+
+def translate_schema(statements):
+    """
+    Translates schema.sql statements to SQLite. Database-level statements are dropped,
+    indexes declared inside CREATE TABLE become CREATE INDEX statements and the views in
+    SQLITE_VIEWS are replaced by their SQLite definitions.
+    """
+    translated = []
+    for statement in statements:
+        if re.match(r"(DROP|CREATE)\s+DATABASE\b|USE\b", statement, re.IGNORECASE):
+            continue
+        view = re.match(r"CREATE\s+VIEW\s+(\w+)", statement, re.IGNORECASE)
+        if view and view.group(1) in SQLITE_VIEWS:
+            translated.append(SQLITE_VIEWS[view.group(1)])
+            continue
+        table_def = loader.parse_create_table(statement)
+        trigger = re.match(r"(CREATE\s+TRIGGER\s+\w+\s+(?:AFTER|BEFORE)\s+\w+\s+ON\s+\w+\s+FOR\s+EACH\s+ROW)\s+(.*)$",
+                           statement, re.IGNORECASE | re.DOTALL)
+        if table_def:
+            table, items, _ = table_def  # Table options (partitioning, engines) do not apply
+            columns, indexes = [], []
+            for item in items:
+                index = re.match(r"(UNIQUE\s+)?(?:KEY|INDEX)\s+(\w+)\s*(\(.*\))$", item, re.IGNORECASE | re.DOTALL)
+                if index:
+                    unique, name, parts = index.groups()
+                    indexes.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} {parts}")
+                elif re.match(r"(CONSTRAINT\s+\w+\s+)?(PRIMARY|FOREIGN|UNIQUE)\b", item, re.IGNORECASE):
+                    columns.append(item)
+                else:
+                    columns.append(translate_column(item))
+            translated.append(f"CREATE TABLE {table} (\n    " + ",\n    ".join(columns) + "\n)")
+            translated += indexes
+        elif trigger:
+            translated.append(f"{trigger.group(1)}\nBEGIN\n    {translate_body(trigger.group(2))};\nEND")
+        else:
+            translated.append(translate_body(statement))
+    return translated
+
+
+@lru_cache(maxsize=256)
+def translate_sql(sql_code):
+    """
+    Translates a command's SQL: %s placeholders become ?, plus translate_body().
+    """
+    return translate_body(sql_code.replace("%s", "?"))
+
+
+class SQLiteCursor:
+    """
+    Cursor that translates MySQL-style SQL and opens a transaction before the first statement,
+    so commands commit or roll back as a unit exactly as they do on MySQL.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.db.cursor()
+
+    def execute(self, sql_code, params=()):
+        self.conn.begin()
+        self.cursor.execute(translate_sql(sql_code), params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class SQLiteConnection:
+    """
+    A per-thread SQLite connection in WAL mode with foreign keys on. close() only ends any open
+    transaction, so the next command on this thread reuses the connection and its statement cache.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None, cached_statements=256)
+        self.db.create_collation(COLLATION, compare_text)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+
+    @property
+    def in_transaction(self):
+        return self.db.in_transaction
+
+    def begin(self):
+        if not self.db.in_transaction:
+            self.db.execute("BEGIN")
+
+    def cursor(self, **kwargs):
+        return SQLiteCursor(self)
+
+    def commit(self):
+        if self.db.in_transaction:
+            self.db.execute("COMMIT")
+
+    def rollback(self):
+        if self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+
+    def close(self):
+        self.rollback()
+
+
+def connect(path=DEFAULT_PATH):
+    """
+    Returns this thread's connection to the database file at path, opening it on first use.
+    """
+    connections = _local.__dict__.setdefault("connections", {})
+    if path not in connections:
+        connections[path] = SQLiteConnection(path)
+    return connections[path]
+
+
+def reset_database(conn, schema_path=loader.SCHEMA_PATH):
+    """
+    Drops every table, view and trigger, then creates the translated schema.sql.
+    Returns True if successful; False otherwise.
+    """
+    try:
+        conn.rollback()
+        db = conn.db
+        db.execute("PRAGMA foreign_keys=OFF")
+        for kind, name in db.execute("SELECT type, name FROM sqlite_master "
+                                     "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'").fetchall():
+            db.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+        db.execute("PRAGMA foreign_keys=ON")
+        db.executescript(";\n".join(translate_schema(loader.read_schema_statements(schema_path))) + ";")
+        return True
+    except (sqlite3.Error, OSError) as e:
+        sys.stderr.write(f"Error resetting database: {e}\n")
+        return False
+
+
+def csv_batches(reader, size=INSERT_BATCH_ROWS):
+    """
+    Groups CSV rows into lists of at most size rows.
+    """
+    batch = []
+    for row in reader:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_folder(conn, folder, tables=loader.TABLES):
+    """
+    Loads <folder>/<table>.csv into each table in foreign-key order, in one transaction.
+    CSV columns the table does not have are skipped, like the MySQL importer does.
+    Returns True if successful; False otherwise.
+    """
+    try:
+        conn.begin()
+        for table in tables:
+            file_path = os.path.join(folder, f"{table}.csv")
+            if not os.path.exists(file_path):
+                continue
+            known = {row[1] for row in conn.db.execute(f"PRAGMA table_info({table})")}
+            with open(file_path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                header = next(reader, [])
+                keep = [i for i, column in enumerate(header) if column in known]
+                sql_code = (f"INSERT INTO {table} ({', '.join(header[i] for i in keep)}) "
+                            f"VALUES ({', '.join('?' * len(keep))})")
+                for batch in csv_batches(reader):
+                    conn.db.executemany(sql_code, [[row[i] for i in keep] for row in batch])
+        conn.commit()
+        return True
+    except (sqlite3.Error, OSError, IndexError) as e:
+        sys.stderr.write(f"Error importing into SQLite: {e}\n")
+        conn.rollback()
+        return False
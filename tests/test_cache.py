@@ -0,0 +1,143 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cache
+
+# Checks of the read command result caches.
+# Expect: python3 -m pytest tests
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def put(self, result_cache, key, rows, tables):
+        result_cache.put(key, rows, tables, result_cache.snapshot(tables))
+
+    def test_hit_and_miss(self):
+        result_cache = cache.ResultCache()
+        self.assertIsNone(result_cache.get(("listReleases", "3")))
+        self.put(result_cache, ("listReleases", "3"), [(1, "Drama", "A")], ("reviews", "releases"))
+        self.assertEqual(result_cache.get(("listReleases", "3")), [(1, "Drama", "A")])
+        self.assertEqual(result_cache.stats()["hits"], 1)
+        self.assertEqual(result_cache.stats()["misses"], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        result_cache = cache.ResultCache(max_entries=2)
+        for key in ("a", "b"):
+            self.put(result_cache, key, [(key,)], ("releases",))
+        result_cache.get("a")
+        self.put(result_cache, "c", [("c",)], ("releases",))
+        self.assertIsNone(result_cache.get("b"))
+        self.assertEqual(result_cache.get("a"), [("a",)])
+        self.assertEqual(result_cache.get("c"), [("c",)])
+        self.assertEqual(result_cache.stats()["evictions"], 1)
+
+    def test_bytes_bound(self):
+        rows = [("x" * 100,)]
+        result_cache = cache.ResultCache(max_bytes=2 * cache.result_size(rows))
+        for key in ("a", "b", "c"):
+            self.put(result_cache, key, rows, ("releases",))
+        self.assertEqual(result_cache.stats()["entries"], 2)
+        self.assertLessEqual(result_cache.stats()["bytes"], result_cache.max_bytes)
+        self.put(result_cache, "big", rows * 10, ("releases",))  # Larger than the whole cache
+        self.assertIsNone(result_cache.get("big"))
+
+    def test_entries_expire(self):
+        result_cache = cache.ResultCache(ttl=0)
+        self.put(result_cache, "a", [(1,)], ("releases",))
+        self.assertIsNone(result_cache.get("a"))
+        self.assertEqual(result_cache.stats()["expirations"], 1)
+        self.assertEqual(result_cache.stats()["entries"], 0)
+
+    def test_invalidate_drops_only_the_tables_entries(self):
+        result_cache = cache.ResultCache()
+        self.put(result_cache, "titles", [(1,)], ("sessions", "videos", "releases"))
+        self.put(result_cache, "popular", [(2,)], ("release_review_counts",))
+        result_cache.invalidate(["releases"])
+        self.assertIsNone(result_cache.get("titles"))
+        self.assertEqual(result_cache.get("popular"), [(2,)])
+        result_cache.clear()
+        self.assertIsNone(result_cache.get("popular"))
+
+    def test_write_during_the_read_keeps_the_result_out(self):
+        result_cache = cache.ResultCache()
+        snapshot = result_cache.snapshot(("releases",))
+        result_cache.invalidate(["releases"])
+        result_cache.put("titles", [(1,)], ("releases",), snapshot)
+        self.assertIsNone(result_cache.get("titles"))
+        snapshot = result_cache.snapshot(("releases",))
+        result_cache.clear()
+        result_cache.put("titles", [(1,)], ("releases",), snapshot)
+        self.assertIsNone(result_cache.get("titles"))
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.db")
+        self.caches = []
+
+    def tearDown(self):
+        for disk_cache in self.caches:
+            disk_cache.db.close()
+        shutil.rmtree(self.directory)
+
+    def open(self, **kwargs):
+        disk_cache = cache.DiskCache(self.path, **kwargs)
+        self.caches.append(disk_cache)
+        return disk_cache
+
+    def test_rows_round_trip(self):
+        rows = [(1, "Éclair", None, 2.5, True, Decimal("9.99"), date(2025, 1, 23),
+                 datetime(2025, 1, 23, 12, 40, 23), time(1, 2, 3), timedelta(hours=1, seconds=5), b"\x00\xff"),
+                (2, "2025-01-23", "", 0, False, Decimal("-0.5"), date(1970, 1, 1),
+                 datetime(1999, 12, 31), time(0), timedelta(0), bytearray(b"ab"))]
+        decoded = cache.decode_rows(cache.encode_rows(rows))
+        self.assertEqual(decoded, rows)
+        self.assertEqual([type(value) for value in decoded[0]], [type(value) for value in rows[0]])
+        with self.assertRaises(TypeError):
+            cache.encode_rows([(object(),)])
+
+    def test_entries_are_shared_and_checked_against_versions(self):
+        writer, reader = self.open(), self.open()
+        writer.put(("listReleases", "3"), ("1", "4"), [(1, "Drama", "A")])
+        self.assertEqual(reader.get(("listReleases", "3"), ("1", "4")), [(1, "Drama", "A")])
+        self.assertIsNone(reader.get(("listReleases", "3"), ("2", "4")))
+        self.assertIsNone(reader.get(("listReleases", "4"), ("1", "4")))
+        self.assertEqual(reader.stats(), {"hits": 1, "misses": 2, "entries": 1})
+
+    def test_unencodable_and_unreadable_rows_are_not_returned(self):
+        disk_cache = self.open()
+        disk_cache.put("a", (), [(object(),)])
+        self.assertIsNone(disk_cache.get("a", ()))
+        disk_cache.db.execute("INSERT INTO results VALUES (?, ?, ?, 0)", (repr("b"), repr(()), "[[{\"$pickle\": \"x\"}]]"))
+        self.assertIsNone(disk_cache.get("b", ()))
+
+    def test_least_recently_used_are_trimmed(self):
+        disk_cache = self.open(max_entries=2)
+        for key in ("a", "b", "c"):
+            disk_cache.put(key, (), [(key,)])
+        self.assertEqual(disk_cache.stats()["entries"], 2)
+        self.assertIsNone(disk_cache.get("a", ()))
+        self.assertEqual(disk_cache.get("c", ()), [("c",)])
+
+    def test_versions_are_reused_while_fresh(self):
+        self.assertIsNone(self.open().fresh_versions(("releases",)))  # max_staleness 0: always re-read
+        disk_cache = self.open(max_staleness=60)
+        self.assertIsNone(disk_cache.fresh_versions(("releases", "reviews")))
+        disk_cache.save_versions({"releases": "18446744073709551615", "reviews": "2"})
+        self.assertEqual(disk_cache.fresh_versions(("reviews", "releases")), ("2", "18446744073709551615"))
+        self.assertIsNone(disk_cache.fresh_versions(("releases", "sessions")))
+        disk_cache.forget_versions()
+        self.assertIsNone(disk_cache.fresh_versions(("releases",)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import columnar
+import project
+
+# The columnar engine must print what the commands print against the same data in a database.
+# Expect: python3 -m pytest tests
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "..", "test_data")
+
+COMMANDS = [
+    ["popularRelease", "10"], ["popularRelease", "2"], ["popularRelease", "0"],
+    ["listReleases", "3"], ["listReleases", "4"], ["listReleases", "6"], ["listReleases", "99"],
+    ["releaseTitle", "1"], ["releaseTitle", "3"], ["releaseTitle", "6"], ["releaseTitle", "77"],
+    ["activeViewer", "1", "2025-01-01", "2025-03-01"],
+    ["activeViewer", "2", "2025-01-01", "2025-03-01"],
+    ["activeViewer", "1", "2025-01-23", "2025-01-23 23:00:00"],
+    ["activeViewer", "1", "2025-01-23 12:40:23", "2025-01-23 12:40:23"],
+    ["videosViewed", "5"], ["videosViewed", "6"], ["videosViewed", "1"], ["videosViewed", "9"],
+]
+
+
+def output(run, argv):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        run(argv)
+    return out.getvalue()
+
+
+class ColumnarParityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.mkdtemp()
+        saved = (project.BACKEND, project.SQLITE_PATH, project.RAW_OUTPUT, project._cache)
+        project.BACKEND = "sqlite"
+        project.SQLITE_PATH = os.path.join(directory, "test.db")
+        project.RAW_OUTPUT = False
+        project._cache = None
+        try:
+            assert output(project.run_command, ["import", TEST_DATA]).strip() == "Success"
+            cls.expected = {tuple(argv): output(project.run_command, argv) for argv in COMMANDS}
+        finally:
+            project.get_connection().db.close()
+            project.sqlite_backend._local.connections.pop(project.SQLITE_PATH, None)
+            project.BACKEND, project.SQLITE_PATH, project.RAW_OUTPUT, project._cache = saved
+            shutil.rmtree(directory)
+
+    def setUp(self):
+        self.np = columnar.np
+
+    def tearDown(self):
+        columnar.np = self.np
+
+    def assert_same_output(self):
+        # A fresh engine, since its indexes are built with whichever path is active
+        engine = columnar.ColumnarEngine(columnar.load_folder(TEST_DATA))
+        for argv in COMMANDS:
+            self.assertEqual(output(lambda argv: columnar.run_commands(engine, [argv]), argv),
+                             self.expected[tuple(argv)], argv)
+
+    def test_without_numpy(self):
+        columnar.np = None
+        self.assert_same_output()
+
+    @unittest.skipUnless(columnar.np, "NumPy is not installed")
+    def test_with_numpy(self):
+        self.assert_same_output()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import loader
+
+# Checks of the CSV import helpers that need no MySQL server.
+# Expect: python3 -m pytest tests
+
+
+class FakeCursor:
+    """
+    Answers the statements import_table() sends on the INSERT path and records the INSERTs.
+    import_state is kept on the connection.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def execute(self, sql_code, params=()):
+        if sql_code.startswith("SHOW COLUMNS"):
+            self.result = [(column,) for column in self.conn.columns]
+        elif sql_code.startswith("SELECT @@max_allowed_packet"):
+            self.result = [(64 * 1024 * 1024,)]
+        elif sql_code.startswith("SELECT file_size"):
+            self.result = [self.conn.state] if self.conn.state else []
+        else:
+            if sql_code.startswith("INSERT INTO import_state"):
+                self.conn.state = params[1:5]
+            self.conn.statements.append((sql_code, params))
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.statements = []
+        self.state = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CsvFolderTest(unittest.TestCase):
+    """
+    Gives each test an empty folder to write CSVs into.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_csv(self, name, text):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, "w", newline='', encoding='utf-8') as f:
+            f.write(text)
+        return file_path
+
+    def inserted(self, conn, table):
+        return [params for sql_code, params in conn.statements if sql_code.startswith(f"INSERT INTO {table}")]
+
+
+class CsvRowsTest(CsvFolderTest):
+
+    def test_blank_lines_are_skipped(self):
+        file_path = self.write_csv("movies.csv", "rid,website_url\n1,a\n\n2,b\n\n")
+        self.assertEqual(list(loader.csv_rows(file_path, [0, 1])), [["1", "a"], ["2", "b"]])
+
+    def test_short_and_long_rows_are_rejected(self):
+        for text in ("rid,website_url\n1,a\n2\n", "rid,website_url\n1,a,extra\n"):
+            file_path = self.write_csv("movies.csv", text)
+            with self.assertRaises(ValueError):
+                list(loader.csv_rows(file_path, [0, 1]))
+
+    def test_malformed_row_fails_the_import(self):
+        self.write_csv("movies.csv", "rid,website_url\n1,a\n2\n")
+        conn = FakeConnection(["rid", "website_url"])
+        job = loader.ImportJob(lambda: conn, self.directory, use_local_infile=False)
+        self.assertFalse(job.run(["movies"]))
+
+    def test_blank_lines_import(self):
+        self.write_csv("movies.csv", "rid,website_url\n1,a\n2,b\n\n")
+        conn = FakeConnection(["rid", "website_url"])
+        job = loader.ImportJob(lambda: conn, self.directory, use_local_infile=False)
+        self.assertIsNotNone(job.load_table_whole("movies", os.path.join(self.directory, "movies.csv")))
+        self.assertEqual(self.inserted(conn, "movies"), [["1", "a", "2", "b"]])
+
+
+class IncrementalImportTest(CsvFolderTest):
+
+    def run_incremental(self, conn, text):
+        file_path = self.write_csv("movies.csv", text)
+        job = loader.ImportJob(lambda: conn, self.directory, use_local_infile=False, changed_tables=set())
+        return job.load_table_incremental("movies", file_path, os.path.getsize(file_path)), job.changed_tables
+
+    def test_only_appended_rows_are_upserted(self):
+        conn = FakeConnection(["rid", "website_url"])
+        self.assertEqual(self.run_incremental(conn, "rid,website_url\n1,a\n2,b\n"), (True, {"movies"}))
+        self.assertEqual(conn.state[3], 2)
+        self.assertEqual(self.run_incremental(conn, "rid,website_url\n1,a\n2,b\n"), (True, set()))
+        conn.statements.clear()
+        self.assertEqual(self.run_incremental(conn, "rid,website_url\n1,a\n2,b\n\n3,c\n"), (True, {"movies"}))
+        self.assertEqual(self.inserted(conn, "movies"), [["3", "c"]])
+        self.assertEqual(conn.state[3], 3)
+        self.assertFalse(any(sql_code.startswith("SELECT MAX") for sql_code, _ in conn.statements))
+
+    def test_short_appended_row_fails(self):
+        conn = FakeConnection(["rid", "website_url"])
+        self.run_incremental(conn, "rid,website_url\n1,a\n")
+        self.assertEqual(self.run_incremental(conn, "rid,website_url\n1,a\n2\n"), (False, set()))
+
+
+class DeferredSchemaTest(CsvFolderTest):
+
+    SCHEMA = """
+CREATE TABLE users (
+    uid INTEGER PRIMARY KEY,
+    email VARCHAR(30) UNIQUE NOT NULL,
+    note VARCHAR(20) DEFAULT 'a;b -- c'  -- Quoted ; and -- stay
+) ENGINE=InnoDB;
+CREATE TABLE reviews (
+    rvid INTEGER PRIMARY KEY,
+    uid INTEGER NOT NULL,
+    UNIQUE KEY uq_reviews (uid, rvid),
+    INDEX idx_reviews_uid (uid),
+    FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE
+);
+CREATE INDEX idx_users_note ON users (note);
+CREATE VIEW user_emails AS SELECT uid, email FROM users
+"""
+
+    def test_keys_and_indexes_are_deferred(self):
+        statements, deferred = loader.deferred_schema(self.write_csv("schema.sql", self.SCHEMA))
+        self.assertEqual(statements, [
+            "CREATE TABLE users (\n    uid INTEGER PRIMARY KEY,\n    email VARCHAR(30) NOT NULL,\n"
+            "    note VARCHAR(20) DEFAULT 'a;b -- c'\n) ENGINE=InnoDB",
+            "CREATE TABLE reviews (\n    rvid INTEGER PRIMARY KEY,\n    uid INTEGER NOT NULL\n)",
+            "CREATE VIEW user_emails AS SELECT uid, email FROM users",
+        ])
+        self.assertEqual(deferred, {
+            "users": ["ADD UNIQUE (email)", "ADD INDEX idx_users_note (note)"],
+            "reviews": ["ADD UNIQUE KEY uq_reviews (uid, rvid)", "ADD INDEX idx_reviews_uid (uid)",
+                        "ADD FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE"],
+        })
+
+    def test_repo_schema_creates_tables_with_only_primary_keys(self):
+        statements, deferred = loader.deferred_schema()
+        for statement in statements:
+            self.assertNotRegex(statement, r"(?i)\b(FOREIGN KEY|UNIQUE|INDEX)\b")
+        self.assertTrue(any("FOREIGN KEY" in item for item in deferred["sessions"]))
+
+
+class WarningCursor:
+
+    def __init__(self, warnings):
+        self.warning_count = len(warnings)
+        self.warnings = warnings
+
+    def execute(self, sql_code, params=()):
+        pass
+
+    def fetchall(self):
+        return self.warnings
+
+
+class LoadWarningsTest(unittest.TestCase):
+
+    def test_row_warnings_fail_the_load(self):
+        for code, message in [(1062, "Duplicate entry"), (1452, "Cannot add or update a child row"),
+                              (1261, "Row 3 doesn't contain data for all columns"),
+                              (1262, "Row 4 was truncated"), (1265, "Data truncated for column 'zip'"),
+                              (1292, "Incorrect datetime value"), (1366, "Incorrect integer value")]:
+            with self.assertRaises(loader.mysql.connector.Error) as raised:
+                loader.check_load_warnings(WarningCursor([("Warning", code, message)]))
+            self.assertEqual(raised.exception.errno, code)
+
+    def test_notes_and_no_warnings_pass(self):
+        loader.check_load_warnings(WarningCursor([]))
+        loader.check_load_warnings(WarningCursor([("Note", 1051, "Unknown table")]))
+
+
+class ChunkRangesTest(unittest.TestCase):
+
+    DATA = ('rid,uid,body\n'
+            '1,2,"plain"\n'
+            '2,3,"two\nlines"\n'
+            '3,4,"quoted ""word""\nand, a comma\n\n"\n'
+            '4,5,\n'
+            '5,6,"last ""one"""\n').encode("utf-8")
+
+    def test_ranges_cover_the_file_and_keep_records_whole(self):
+        header_end = self.DATA.find(b"\n") + 1
+        expected = list(loader.csv.reader(self.DATA[header_end:].decode("utf-8").splitlines(True)))
+        for chunk_size in (1, 7, 20, 100, 10 ** 7):
+            ranges = loader.chunk_ranges(self.DATA, header_end, chunk_size)
+            self.assertEqual(ranges[0][0], header_end)
+            self.assertEqual(ranges[-1][1], len(self.DATA))
+            self.assertTrue(all(end == begin for (_, end), (begin, _) in zip(ranges, ranges[1:])))
+            rows = [row for begin, end in ranges for row in loader.csv.reader(loader.mmap_lines(self.DATA, begin, end))]
+            self.assertEqual(rows, expected, chunk_size)
+
+
+class ChunkedImportTest(CsvFolderTest):
+
+    def run_chunked(self, text):
+        file_path = self.write_csv("movies.csv", text)
+        conn = FakeConnection(["rid", "website_url"])
+        job = loader.ImportJob(lambda: conn, self.directory, use_local_infile=False,
+                               chunk_workers=2, chunk_size=8, chunk_retries=1)
+        return job.load_table_chunked("movies", file_path), conn
+
+    def test_blank_lines_are_skipped(self):
+        rows, conn = self.run_chunked("rid,website_url\n1,a\n\n2,b\n\n3,c\n")
+        self.assertEqual(rows, 3)
+        rids = sorted(value for params in self.inserted(conn, "movies") for value in params[::2])
+        self.assertEqual(rids, ["1", "2", "3"])
+
+    def test_short_row_fails_its_chunk(self):
+        rows, _ = self.run_chunked("rid,website_url\n1,a\n2\n3,c\n")
+        self.assertIsNone(rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
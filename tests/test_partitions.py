@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import loader
+import partitions
+
+# Checks of the sessions partitioning DDL that need no MySQL server.
+# Expect: python3 -m pytest tests
+
+
+class PartitionCursor:
+    """
+    Answers list_partitions() from a list of (name, PARTITION_DESCRIPTION) and records the ALTERs.
+    """
+
+    def __init__(self, described):
+        self.described = described
+        self.statements = []
+
+    def execute(self, sql_code, params=()):
+        self.statements.append(sql_code)
+
+    def fetchall(self):
+        return self.described
+
+
+class PartitionedSchemaTest(unittest.TestCase):
+
+    def test_sessions_is_partitioned_by_month(self):
+        statements = loader.read_schema_statements()
+        rewritten = partitions.partitioned_schema(statements, first_month="2025-01", ahead=0)
+        sessions = [statement for statement in rewritten if statement.startswith("CREATE TABLE sessions")]
+        self.assertEqual(len(sessions), 1)
+        self.assertNotIn("FOREIGN KEY", sessions[0])
+        self.assertIn("sid INTEGER AUTO_INCREMENT,", sessions[0])
+        self.assertIn("PRIMARY KEY (sid, initiate_at)\n)", sessions[0])
+        clause = sessions[0][sessions[0].index("PARTITION BY"):].splitlines()
+        current = partitions.month_start(date.today())
+        self.assertEqual(clause[0], "PARTITION BY RANGE COLUMNS(initiate_at) (")
+        self.assertEqual(clause[1], "    PARTITION p_before VALUES LESS THAN ('2025-01-01'),")
+        self.assertEqual(clause[2], "    PARTITION p202501 VALUES LESS THAN ('2025-02-01'),")
+        self.assertEqual(clause[-3], f"    PARTITION {partitions.partition_name(current)} "
+                                     f"VALUES LESS THAN ('{partitions.add_months(current, 1)}'),")
+        self.assertEqual(clause[-2:], ["    PARTITION pmax VALUES LESS THAN (MAXVALUE)", ")"])
+        # Every other statement is left alone
+        self.assertEqual([statement for statement in rewritten if statement not in sessions],
+                         [statement for statement in statements if not statement.startswith("CREATE TABLE sessions")])
+
+    def test_months(self):
+        self.assertEqual(partitions.month_start("2025-03-17"), date(2025, 3, 1))
+        self.assertEqual(partitions.add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(partitions.add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+        self.assertEqual(partitions.month_partitions(date(2024, 12, 1), date(2025, 1, 1)), [
+            "PARTITION p202412 VALUES LESS THAN ('2025-01-01')",
+            "PARTITION p202501 VALUES LESS THAN ('2025-02-01')",
+        ])
+
+    def test_future_partitions_split_pmax(self):
+        current = partitions.month_start(date.today())
+        cursor = PartitionCursor([("p_before", f"'{partitions.add_months(current, -1)}'"),
+                                  (partitions.partition_name(partitions.add_months(current, -1)), f"'{current}'"),
+                                  ("pmax", "MAXVALUE")])
+        created = partitions.add_future_partitions(cursor, ahead=1)
+        self.assertEqual(created, [partitions.partition_name(current),
+                                   partitions.partition_name(partitions.add_months(current, 1))])
+        self.assertTrue(cursor.statements[-1].startswith("ALTER TABLE sessions REORGANIZE PARTITION pmax INTO ("))
+        self.assertTrue(cursor.statements[-1].endswith("PARTITION pmax VALUES LESS THAN (MAXVALUE)\n)"))
+        self.assertEqual(partitions.add_future_partitions(PartitionCursor([])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
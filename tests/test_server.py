@@ -0,0 +1,82 @@
+import io
+import os
+import sys
+import stat
+import shutil
+import tempfile
+import threading
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import project
+import server
+
+# Checks of the serve protocol over a Unix socket, with a stand-in for project.run_command.
+# Expect: python3 -m pytest tests
+
+
+def echo_command(argv):
+    print("|".join(argv))
+    return 0 if argv[0] != "addGenre" else 1
+
+
+class ProtocolTest(unittest.TestCase):
+
+    def test_commands_round_trip(self):
+        for argv in (["listReleases", "3"], ["updateRelease", "1", 'Say "hi", again'], ["insertViewer", "9", "Éclair", ""]):
+            line = server.encode_command(argv)
+            self.assertTrue(line.endswith(b"\n"))
+            self.assertEqual(server.decode_command(line), argv)
+
+
+@unittest.skipUnless(hasattr(server, "UnixCommandServer"), "no Unix sockets")
+class UnixServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.address = os.path.join(self.directory, "cs122a.sock")
+        self.stdout = sys.stdout
+        sys.stdout = server.ThreadOutput(sys.stdout)
+        self.server = server.bind(echo_command, self.address)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        sys.stdout = self.stdout
+        shutil.rmtree(self.directory)
+
+    def test_socket_is_private(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.address).st_mode), 0o600)
+
+    def test_commands_and_their_status(self):
+        with contextlib.closing(server.connect(self.address)) as sock, sock.makefile("rwb") as sock_file:
+            self.assertEqual(server.send_command(sock_file, ["listReleases", "a,b"]), (0, "listReleases|a,b\n"))
+            self.assertEqual(server.send_command(sock_file, ["addGenre", "1", "Drama"]), (1, "addGenre|1|Drama\n"))
+            self.assertEqual(server.send_command(sock_file, ["import", "test_data"]), (1, "Fail"))
+            self.assertEqual(server.send_command(sock_file, ["noSuchCommand"]), (1, "Fail"))
+
+
+class CommandLineTest(unittest.TestCase):
+
+    def run_command(self, argv):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = project.run_command(argv)
+        return status, out.getvalue()
+
+    def test_unknown_command_fails_as_served(self):
+        self.assertEqual(self.run_command(["noSuchCommand"]), (1, "Fail"))
+
+    def test_bad_serve_options_fail(self):
+        for options in (["--port=http"], ["--port=70000"], ["--port"], ["--pool-size=0"], ["--pool-size=x"],
+                        ["--socket"]):
+            self.assertEqual(self.run_command(["serve"] + options), (1, "Fail"), options)
+
+
+if __name__ == '__main__':
+    unittest.main()
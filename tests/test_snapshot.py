@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import columnar
+import snapshot
+
+# Round trips and damaged files for the binary snapshots; no database needed.
+# Expect: python3 -m pytest tests
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "..", "test_data")
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        snapshot.export_snapshot(TEST_DATA, self.directory)
+        self.file_path = os.path.join(self.directory, "sessions" + snapshot.SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def values(self, table):
+        return [[table.value(name, i) for name in table.kinds] for i in range(len(table))]
+
+    def test_round_trip(self):
+        loaded = snapshot.load_snapshot(self.directory)
+        for name, table in loaded.items():
+            csv_table = columnar.load_table(os.path.join(TEST_DATA, f"{name}.csv"), name)
+            self.assertEqual(self.values(table), self.values(csv_table), name)
+
+    def test_truncated_files_are_rejected(self):
+        with open(self.file_path, "rb") as f:
+            data = f.read()
+        for size in (0, 4, len(snapshot.MAGIC) + 2, 40, len(data) // 2, len(data) - 3, len(data) - 1):
+            with open(self.file_path, "wb") as f:
+                f.write(data[:size])
+            with self.assertRaises(ValueError, msg=size):
+                snapshot.read_table(self.file_path, "sessions")
+
+    def rewrite_header(self, change):
+        with open(self.file_path, "rb") as f:
+            data = f.read()
+        prefix = len(snapshot.MAGIC) + snapshot.HEADER_LENGTH.size
+        (length,) = snapshot.HEADER_LENGTH.unpack_from(data, len(snapshot.MAGIC))
+        header = json.loads(data[prefix:prefix + length])
+        change(header)
+        encoded = json.dumps(header).encode("utf-8")
+        # Buffer offsets are relative to the aligned end of the header, so the data moves with it
+        start = snapshot.aligned(prefix + len(encoded))
+        with open(self.file_path, "wb") as f:
+            f.write(snapshot.MAGIC + snapshot.HEADER_LENGTH.pack(len(encoded)) + encoded.ljust(start - prefix)
+                    + data[snapshot.aligned(prefix + length):])
+
+    def test_corrupt_headers_are_rejected(self):
+        changes = [
+            lambda header: header.update(rows=header["rows"] + 1),
+            lambda header: header.update(rows=header["rows"] - 1),
+            lambda header: header["buffers"].pop(),
+            lambda header: header["buffers"][0].__setitem__(2, header["buffers"][0][2] - 3),
+            lambda header: header["buffers"][-1].__setitem__(1, 10 ** 9),
+            lambda header: header.pop("buffers"),
+        ]
+        for change in changes:
+            snapshot.export_snapshot(TEST_DATA, self.directory, ["sessions"])
+            self.rewrite_header(change)
+            with self.assertRaises(ValueError):
+                snapshot.read_table(self.file_path, "sessions")
+
+
+if __name__ == '__main__':
+    unittest.main()
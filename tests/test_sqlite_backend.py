@@ -0,0 +1,201 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import contextlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import columnar
+import project
+
+# End-to-end checks of the commands on the SQLite backend, against a fresh import of test_data.
+# Expect: python3 -m pytest tests
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "..", "test_data")
+
+
+class SQLiteBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.saved = (project.BACKEND, project.SQLITE_PATH, project.RAW_OUTPUT, project._cache)
+        project.BACKEND = "sqlite"
+        project.SQLITE_PATH = os.path.join(self.directory, "test.db")
+        project.RAW_OUTPUT = False
+        project._cache = None
+        self.assertEqual(self.run_command(["import", TEST_DATA]), "Success")
+
+    def tearDown(self):
+        project.get_connection().db.close()
+        project.sqlite_backend._local.connections.pop(project.SQLITE_PATH, None)
+        project.BACKEND, project.SQLITE_PATH, project.RAW_OUTPUT, project._cache = self.saved
+        shutil.rmtree(self.directory)
+
+    def run_command(self, argv):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            project.run_command(argv)
+        return out.getvalue().strip()
+
+    def query(self, sql_code, params=()):
+        conn = project.get_connection()
+        try:
+            return conn.db.execute(sql_code, params).fetchall()
+        finally:
+            conn.close()
+
+    def rollups(self, tables):
+        return {table: sorted(self.query(f"SELECT * FROM {table}")) for table in tables}
+
+    def assert_rollups_current(self, tables=project.ROLLUP_TABLES):
+        """
+        The rollups the triggers maintained must equal a full rebuild from the base tables.
+        """
+        maintained = self.rollups(tables)
+        self.assertEqual(self.run_command(["rebuildRollups"]), "Success")
+        self.assertEqual(self.rollups(tables), maintained)
+
+    def test_rollups_follow_writes(self):
+        self.assert_rollups_current()
+        self.assertEqual(self.run_command(["insertSession", "900", "4", "5", "2", "2025-03-01 10:00:00",
+                                           "2025-03-01 11:00:00", "1080p", "desktop"]), "Success")
+        self.assert_rollups_current()
+        self.assertEqual(self.run_command(["deleteViewer", "3"]), "Success")
+        self.assert_rollups_current()
+
+    def test_upserted_sessions_rebuild_their_rollups(self):
+        # What an incremental import's ON DUPLICATE KEY UPDATE does to an existing session:
+        # the row changes without any AFTER INSERT trigger firing
+        conn = project.get_connection()
+        try:
+            conn.db.execute("UPDATE sessions SET rid = 6, ep_num = 2, uid = 4, initiate_at = '2024-06-01 09:00:00' WHERE sid = 1")
+        finally:
+            conn.close()
+        self.assertTrue(project.rebuild_upserted_rollups({"sessions"}))
+        self.assert_rollups_current()
+
+    def active_viewers(self, N, start, end):
+        """
+        activeViewer as MySQL evaluates it: initiate_at BETWEEN the range's datetimes, where a
+        date alone means its midnight.
+        """
+        start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+        counts = {}
+        for uid, initiate_at in self.query("SELECT uid, initiate_at FROM sessions"):
+            if start <= datetime.fromisoformat(initiate_at) <= end:
+                counts[uid] = counts.get(uid, 0) + 1
+        return self.query("SELECT uid, first_name, last_name FROM viewers WHERE uid IN "
+                          f"({', '.join(str(uid) for uid, n in counts.items() if n >= N) or 'NULL'}) ORDER BY uid")
+
+    def test_active_viewer_day_split(self):
+        # A session at exactly midnight, which a date-only end includes
+        self.assertEqual(self.run_command(["insertSession", "900", "4", "5", "2", "2025-02-16 00:00:00",
+                                           "2025-02-16 01:00:00", "1080p", "desktop"]), "Success")
+        ranges = [
+            ("2025-01-01", "2025-12-31 23:59:59"),            # whole days
+            ("2025-01-23 12:00:00", "2025-02-15 11:32:45"),   # partial days at both edges
+            ("2025-01-23 13:00:00", "2025-01-23 14:00:00"),   # inside one day
+            ("2025-02-15", "2025-02-15 12:00:00"),            # whole start, partial end
+            ("2025-02-15 12:00:00", "2025-02-16"),            # date-only end inside the next day
+            ("2025-02-16", "2025-02-16"),                     # one instant: midnight
+            ("2024-01-01", "2026-01-01"),
+        ]
+        for N in (1, 2, 3):
+            for start, end in ranges:
+                rows = [tuple(row) for row in project.activeViewer(str(N), start, end).all()]
+                self.assertEqual(rows, self.active_viewers(N, start, end), (N, start, end))
+
+    def test_text_orders_like_mysql(self):
+        # utf8mb4_0900_ai_ci ignores case and accents: apple < Banana < cherry < Éclair < zebra
+        for rid, title in (("2", "apple"), ("5", "Banana"), ("6", "Éclair")):
+            self.assertEqual(self.run_command(["updateRelease", rid, title]), "Success")
+        titles = [row.title for row in project.listReleases("3").all()]
+        self.assertEqual(titles, sorted(titles, key=columnar.collation_key))
+        self.assertEqual(self.query("SELECT title FROM releases WHERE rid IN (2, 5, 6) ORDER BY title"),
+                         [("apple",), ("Banana",), ("Éclair",)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM releases WHERE title = 'ECLAIR'"), [(1,)])
+
+    def test_genres_keep_their_order(self):
+        self.assertEqual(self.query("SELECT genres FROM user_genre_lists WHERE uid = 1"),
+                         [("Romance;Documentary;Comedy",)])
+        self.assertEqual(self.run_command(["addGenre", "1", "Action"]), "Success")
+        self.assertEqual(self.run_command(["addGenre", "1", "romance"]), "Fail")
+        self.assertEqual(self.query("SELECT genres FROM user_genre_lists WHERE uid = 1"),
+                         [("Romance;Documentary;Comedy;Action",)])
+        self.assertEqual(self.run_command(["insertViewer", "900", "x@example.org", "x", "1 Main St", "Irvine", "CA",
+                                           "92617", "Thriller;Drama;Anime", "2025-01-01", "X", "Y", "free"]),
+                         "Success")
+        self.assertEqual(self.query("SELECT genres FROM user_genre_lists WHERE uid = 900"),
+                         [("Thriller;Drama;Anime",)])
+
+    def test_repeated_genres_keep_the_first(self):
+        self.assertEqual(self.run_command(["insertViewer", "900", "x@example.org", "x", "1 Main St", "Irvine", "CA",
+                                           "92617", "Drama; drama;Anime;DRAMA", "2025-01-01", "X", "Y", "free"]),
+                         "Success")
+        self.assertEqual(self.query("SELECT genres FROM user_genre_lists WHERE uid = 900"), [("Drama;Anime",)])
+        self.assertEqual(self.run_command(["addGenre", "900", "anime"]), "Fail")
+        self.assertEqual(self.run_command(["addGenre", "999999", "Anime"]), "Fail")
+
+    def test_concurrent_add_genre(self):
+        genres = [f"Genre {n}" for n in range(8)]
+        outcomes = []
+        threads = [threading.Thread(target=lambda genre=genre: outcomes.append(project.addGenre(["1", genre])))
+                   for genre in genres]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(outcome is project.results.SUCCESS for outcome in outcomes), outcomes)
+        rows = self.query("SELECT seq, genre FROM user_genres WHERE uid = 1 ORDER BY seq")
+        self.assertEqual([seq for seq, _ in rows], list(range(1, len(rows) + 1)))
+        self.assertEqual(sorted(genre for _, genre in rows[3:]), genres)
+
+    def test_batch_rolls_back_only_the_failed_write(self):
+        lines = [
+            "updateRelease,1,First",
+            "insertMovie,1,http://example.org",  # Fails: rid 1 is already a movie or a series
+            "updateRelease,2,Second",
+            "releaseTitle,1",
+        ]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            project.run_batch(lines, commit_every=2)
+        output = out.getvalue().splitlines()
+        self.assertEqual(output[0], "Success")
+        self.assertTrue(output[1].startswith("Fail"))
+        self.assertEqual(output[2], "Success")
+        self.assertEqual(self.query("SELECT rid, title FROM releases WHERE rid IN (1, 2) ORDER BY rid"),
+                         [(1, "First"), (2, "Second")])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM movies WHERE website_url = 'http://example.org'"), [(0,)])
+
+
+    def test_failures_are_results(self):
+        rows = project.listReleases("3")
+        self.assertTrue(rows.ok)
+        self.assertEqual([tuple(row) for row in rows.all()],
+                         self.query(project.sqlite_backend.translate_sql(project.LIST_RELEASES_SQL), ("3",)))
+        self.assertIsInstance(project.popularRelease(["many"]), project.results.Failure)
+        query = project.READ_QUERIES["listReleases"]
+        project.READ_QUERIES["listReleases"] = lambda uid: ("SELECT missing FROM releases", ())
+        try:
+            self.assertIsInstance(project.listReleases("3"), project.results.Failure)
+        finally:
+            project.READ_QUERIES["listReleases"] = query
+        path = project.SQLITE_PATH
+        project.SQLITE_PATH = os.path.join(self.directory, "missing", "test.db")
+        try:
+            for result in (project.listReleases("3"), project.activeViewer("1", "2025-01-01", "2025-02-01"),
+                           project.addGenre(["1", "Action"]), project.deleteViewer("3")):
+                self.assertIsInstance(result, project.results.Failure)
+                self.assertEqual(result.message, project.NO_CONNECTION)
+        finally:
+            project.SQLITE_PATH = path
+
+
+if __name__ == '__main__':
+    unittest.main()